@@ -1,10 +1,13 @@
 import os
 import csv
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from datetime import datetime
 import re
 import sys
 import numpy as np
+from csv_turbostat import RollingMean
 
 class PowertopProcessor:
     """
@@ -26,22 +29,30 @@ class PowertopProcessor:
     files : list
         A list of filenames in the specified directory containing the PowerTOP log files.
     df : pandas.DataFrame
-        A DataFrame used to store the data extracted from the log files.
+        A DataFrame with the data extracted from the log files, one row per timestamp and one column per process.
     df_metrics : pandas.DataFrame
         A DataFrame used to store the moving average of power consumption.
     window_size : int
         The number of items in the moving window to perform the operation.
+    workers : int
+        The number of processes parsing the log files, 1 parses them in this process.
 
     Methods
     -------
-    __init__(path: str, results: str, window_size: int)
-        Initializes a new PowertopProcessor object with the directory path, result base name, and window size.
+    __init__(path: str, results: str, window_size: int, workers: int = 1)
+        Initializes a new PowertopProcessor object with the directory path, result base name, window size and workers.
     load_data() -> None
         Loads the PowerTOP log data and stores it in the instance's DataFrame.
+    parse_file(file: str) -> tuple
+        Extracts the timestamp, process IDs and power consumption values of one log file.
+    merge(parsed: iterable) -> None
+        Records the data of the parsed log files, in order.
     set_ts(ts: int) -> None
-        Adds a new timestamp to the DataFrame as a new row.
+        Records a new timestamp, which becomes a row of the DataFrame.
     set_pw(ts: int, pid: str, pw: float) -> None
-        Updates the DataFrame with power consumption values for a specific timestamp and process ID.
+        Records the power consumption value of a process ID at a specific timestamp.
+    build_table() -> None
+        Builds the DataFrame from the recorded timestamps and power consumption values.
     conv_w(string: str) -> float
         Converts a power consumption string (in various units) to a value in watts.
     sum_col(df: pandas.DataFrame) -> list
@@ -52,11 +63,15 @@ class PowertopProcessor:
         Saves the calculated metrics to a CSV file.
     process_files() -> None
         Processes the PowerTOP log files in the specified directory, extracting relevant data.
+    watch(idle: float = None) -> None
+        Processes each new PowerTOP log file as it is written and appends its moving average to the results file.
+    append_snapshot(file: str, writer: csv.writer) -> None
+        Updates the moving window with one log file and writes its row of the results file.
     """
 
-    def __init__(self, path: str, results: str, window_size: int):
+    def __init__(self, path: str, results: str, window_size: int, workers: int = 1):
         """
-        Initializes the PowertopProcessor object with the directory path, result base name, and window size.
+        Initializes the PowertopProcessor object with the directory path, result base name, window size and workers.
 
         Parameters
         ----------
@@ -66,6 +81,8 @@ class PowertopProcessor:
             The base name used to save the generated result files.
         window_size : int
             The window size for calculating moving averages.
+        workers : int, optional
+            The number of processes parsing the log files (default is 1, no process pool).
         """
 
         self._col = 6
@@ -77,6 +94,20 @@ class PowertopProcessor:
         self._df = pd.DataFrame(columns=['Timestamp'])
         self._df_metrics = pd.DataFrame()
         self._window_size = window_size
+        self._workers = workers
+
+        # Records of the log files, turned into the DataFrame at once by build_table
+        self._timestamps = []
+        self._rows = {}
+        self._pids = {}
+        self._pw_rows = array('q')
+        self._pw_cols = array('q')
+        self._pw_values = array('d')
+        self._float_ts = False
+
+        # Rolling mean of the power consumption sums and last timestamp written, in watch mode
+        self._window = None
+        self._last_ts = None
 
     @property
     def col(self):
@@ -150,28 +181,78 @@ class PowertopProcessor:
     def window_size(self, value: int):
         self._window_size = value
 
+    @property
+    def workers(self):
+        return self._workers
+
+    @workers.setter
+    def workers(self, value: int):
+        self._workers = value
+
     def load_data(self) -> None:
         """
         This method reads the PowerTOP CSV files, processes each log file, and stores the extracted data
-        in the instance's DataFrame.
+        in the instance's DataFrame. The files are read in name order, which is their time order, so the process
+        columns, and the order their values are summed in, do not depend on the order the directory is listed in.
+        With more than one worker the files are parsed by a process pool; the results are merged in the order of
+        the files, so the DataFrame is the same as when parsed serially.
         """
 
-        for file in self.files:
-            if self.file_name in file:
-                ts = int(datetime.strptime(file, 'powertop-%Y%m%d-%H%M%S.csv').timestamp())
-                self.set_ts(ts)
+        files = sorted(file for file in self.files if self.file_name in file)
+        if self.workers > 1 and len(files) > 1:
+            chunksize = max(1, len(files) // (4 * self.workers))
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                self.merge(executor.map(self.parse_file, files, chunksize=chunksize))
+        else:
+            self.merge(map(self.parse_file, files))
+
+        self.build_table()
+
+    def parse_file(self, file: str) -> tuple:
+        """
+        This method extracts the data of one PowerTOP log file. It only reads the instance's settings, so it can
+        run in a worker process.
+
+        Parameters
+        ----------
+        file : str
+            The name of the log file, in the directory of the instance.
+
+        Returns
+        -------
+        tuple
+            The timestamp of the file, the list of process IDs and an array with their power consumption in watts.
+        """
+
+        ts = int(datetime.strptime(file, 'powertop-%Y%m%d-%H%M%S.csv').timestamp())
+        pids = []
+        pws = array('d')
+        with open(os.path.join(self.path, file), 'r') as file:
+            file_n = csv.reader(file, delimiter=';')
+            for row in file_n:
+                if len(row) > self.col and self.desc in row[self.col]:
+                    pids.append(re.search(r'\[(.*?)\]', row[self.col]).group(1))
+                    pws.append(self.conv_w(row[7]))
+        return ts, pids, pws
+
+    def merge(self, parsed) -> None:
+        """
+        This method records the data returned by parse_file, in the order given.
+
+        Parameters
+        ----------
+        parsed : iterable
+            The (timestamp, process IDs, power consumption values) tuples of the log files.
+        """
 
-                with open(os.path.join(self.path, file), 'r') as file:
-                    file_n = csv.reader(file, delimiter=';')
-                    for row in file_n:
-                        if len(row) > self.col and self.desc in row[self.col]:
-                            pid = re.search(r'\[(.*?)\]', row[self.col]).group(1)
-                            pw = self.conv_w(row[7])
-                            self.set_pw(ts, pid, pw)
+        for ts, pids, pws in parsed:
+            self.set_ts(ts)
+            for pid, pw in zip(pids, pws):
+                self.set_pw(ts, pid, pw)
 
     def set_ts(self, ts: int) -> None:
         """
-        This method adds a new row to the DataFrame where the first column is the timestamp.
+        This method records a new timestamp, which becomes a row of the DataFrame whose first column is the timestamp.
 
         Parameters
         ----------
@@ -179,12 +260,17 @@ class PowertopProcessor:
             The timestamp value to be added as a new row in the DataFrame.
         """
 
-        new_row = [ts] + [np.nan] * (self.df.shape[1] - 1)
-        self.df.loc[len(self.df)] = new_row
+        # A row appended after the first process column existed used to be padded with NaN,
+        # which turned the Timestamp column into floats. Kept so the output files do not change
+        if self._pids:
+            self._float_ts = True
+        self._rows[ts] = len(self._timestamps)
+        self._timestamps.append(ts)
 
     def set_pw(self, ts: int, pid: str = None, pw: float = None) -> None:
         """
-        Updates the DataFrame with power consumption values for a specific timestamp and process ID.
+        Records the power consumption value of a process ID at a specific timestamp. A process gets its column
+        the first time it is seen, and a later value for the same timestamp and process replaces the previous one.
 
         Parameters
         ----------
@@ -196,7 +282,32 @@ class PowertopProcessor:
             The power consumption value in watts (default is None).
         """
 
-        self.df.loc[self.df['Timestamp'] == ts, pid] = pw
+        col = self._pids.setdefault(pid, len(self._pids))
+        self._pw_rows.append(self._rows[ts])
+        self._pw_cols.append(col)
+        self._pw_values.append(pw)
+
+    def build_table(self) -> None:
+        """
+        This method builds the DataFrame from the recorded values with a single pivot: one row per timestamp, in the
+        order the files were read, and one column per process ID, NaN where a process has no value.
+        """
+
+        if not self._timestamps:
+            self.df = pd.DataFrame(columns=['Timestamp'])
+            return
+
+        n_rows, n_cols = len(self._timestamps), len(self._pids)
+        values = np.full((n_rows, n_cols), np.nan)
+        cells = np.frombuffer(self._pw_rows, dtype=np.int64) * n_cols + np.frombuffer(self._pw_cols, dtype=np.int64)
+        pw = np.frombuffer(self._pw_values, dtype=np.float64)
+        # Last occurrence of each cell, as successive assignments would leave it
+        last = len(cells) - 1 - np.unique(cells[::-1], return_index=True)[1]
+        values.flat[cells[last]] = pw[last]
+
+        ts = np.array(self._timestamps, dtype=np.float64 if self._float_ts else np.int64)
+        self.df = pd.DataFrame(values, columns=list(self._pids))
+        self.df.insert(0, 'Timestamp', ts)
 
     def conv_w(self, string: str) -> float:
         """
@@ -268,18 +379,102 @@ class PowertopProcessor:
         self.window()
         self.save_results()
 
+    def watch(self, idle: float = None) -> None:
+        """
+        This method processes the PowerTOP log files while they are written: each new file updates the moving
+        average of power consumption, which is appended to the metrics file right away. The files already in the
+        directory are processed first. Only the last window_size values are kept, so memory does not grow with
+        the number of files, and the full data file is not written. The metrics file is the same, byte for byte,
+        as the one written by process_files for the same log files, except when no file but the last one lists a
+        process, where process_files writes the timestamps as integers.
+
+        Parameters
+        ----------
+        idle : float, optional
+            The number of seconds without a new log file after which the method returns (default is None, it runs
+            until interrupted).
+        """
+
+        from inotify_simple import INotify, flags
+
+        inotify = INotify()
+        # Watched before listing the directory, so no file is missed in between
+        inotify.add_watch(self.path, flags.CLOSE_WRITE | flags.MOVED_TO)
+        self._window = RollingMean(self.window_size)
+        try:
+            with open(self.results + '.csv', 'w', newline='') as file:
+                writer = csv.writer(file, lineterminator='\n')
+                writer.writerow(['Timestamp', 'ProcWatt'])
+                for name in sorted(os.listdir(self.path)):
+                    if self.file_name in name:
+                        self.append_snapshot(name, writer)
+                file.flush()
+
+                while True:
+                    events = inotify.read(timeout=None if idle is None else int(idle * 1000))
+                    if not events:
+                        return
+                    for event in events:
+                        if self.file_name in event.name:
+                            self.append_snapshot(event.name, writer)
+                    file.flush()
+        finally:
+            inotify.close()
+
+    def append_snapshot(self, file: str, writer) -> None:
+        """
+        This method adds the power consumption of one PowerTOP log file to the moving window and writes the
+        moving average at its timestamp, empty until the window is full as in the batch results. Files older than
+        the last one written are skipped.
+
+        The values are added in the order the processes were first seen, as process_files adds the columns of a
+        row, so the moving averages match the batch results to within floating-point rounding.
+
+        Parameters
+        ----------
+        file : str
+            The name of the log file, in the directory of the instance.
+        writer : csv.writer
+            The writer of the metrics file.
+        """
+
+        ts, pids, pws = self.parse_file(file)
+        if self._last_ts is not None and ts <= self._last_ts:
+            return
+        self._last_ts = ts
+
+        # A process listed twice in a file keeps its last value
+        values = dict(zip(pids, pws))
+        for pid in values:
+            self._pids.setdefault(pid, len(self._pids))
+        total = 0.0
+        for _, pw in sorted((self._pids[pid], pw) for pid, pw in values.items()):
+            total += pw
+        mean = self._window.update(total)
+        writer.writerow([float(ts), '' if np.isnan(mean) else mean])
+
 def main():
     """
     This function parses the command-line arguments for the path to the PowerTOP log files, the base name for saving the results,
-    and the window size for aggregating the metrics. It then processes the files using the PowertopProcessor class.
+    the window size for aggregating the metrics and, optionally, the number of worker processes. It then processes the files using the PowertopProcessor class,
+    or with --watch, processes them as they are written until interrupted.
     """
     
-    path = sys.argv[1]
-    results = sys.argv[2]
-    window_size = int(sys.argv[3])
-
-    pt = PowertopProcessor(path, results, window_size)
-    pt.process_files()
+    watch = '--watch' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--watch']
+    path = args[0]
+    results = args[1]
+    window_size = int(args[2])
+    workers = int(args[3]) if len(args) > 3 else 1
+
+    pt = PowertopProcessor(path, results, window_size, workers)
+    if watch:
+        try:
+            pt.watch()
+        except KeyboardInterrupt:
+            pass
+    else:
+        pt.process_files()
 
 if __name__ == "__main__":
     main()
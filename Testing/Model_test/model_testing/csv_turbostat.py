@@ -1,6 +1,89 @@
+import math
+import os
+import time
+from collections import deque
+import numpy as np
 import pandas as pd
 import sys
 
+TIME_COLUMN = 'Time_Of_Day_Seconds'
+# Columns that identify the CPU of a row when turbostat prints one row per CPU
+TOPOLOGY_COLUMNS = ('Package', 'Die', 'Node', 'Core', 'CPU')
+STATS = ('mean', 'var', 'min', 'max')
+
+class RollingMean:
+    """
+    A rolling mean updated one value at a time, which keeps only the values in the window.
+
+    The sum of the window is updated in O(1) and recomputed exactly every `window_size` values, so the
+    rounding errors do not build up over a long stream. The means match `pandas.Series.rolling(window).mean()`
+    to within floating-point rounding, not to the last digit: NaN until `window_size` values are in the
+    window, or while it contains a NaN.
+
+    Attributes
+    ----------
+    window_size : int
+        The number of values in the rolling window.
+
+    Methods
+    -------
+    update(value)
+        Adds a value to the window and returns the mean of the window.
+    """
+
+    def __init__(self, window_size: int):
+        """
+        Initializes an empty window.
+
+        Parameters
+        ----------
+        window_size : int
+            The number of values in the rolling window.
+        """
+
+        self.window_size = window_size
+        self._values = deque()
+        self._sum = 0.0
+        self._nans = 0
+        self._updates = 0
+
+    def update(self, value: float) -> float:
+        """
+        Adds a value to the window, removing the oldest one once the window is full.
+
+        Parameters
+        ----------
+        value : float
+            The new value, NaN for a missing value.
+
+        Returns
+        -------
+        float
+            The mean of the window, NaN if it does not have `window_size` values.
+        """
+
+        if len(self._values) == self.window_size:
+            old = self._values.popleft()
+            if math.isnan(old):
+                self._nans -= 1
+            else:
+                self._sum -= old
+        self._values.append(value)
+        if math.isnan(value):
+            self._nans += 1
+        else:
+            self._sum += value
+
+        self._updates += 1
+        if self._updates == self.window_size:
+            self._updates = 0
+            self._sum = math.fsum(v for v in self._values if not math.isnan(v))
+
+        if self._nans or len(self._values) < self.window_size:
+            return math.nan
+        return self._sum / self.window_size
+
+
 class TurbostatProcessor:
     """
     A class used to process turbostat data files and generate a CSV result with power consumption statistics.
@@ -13,6 +96,12 @@ class TurbostatProcessor:
         The path where the resulting CSV file will be saved.
     window_size : int
         The rolling window size for averaging power consumption.
+    columns : tuple
+        The turbostat columns to process, ('all',) for every column but the time and CPU topology.
+    stats : tuple
+        The rolling statistics computed for each column, among 'mean', 'var', 'min' and 'max'.
+    float32 : bool
+        Whether the floating-point columns are stored in single precision.
     df : pandas.DataFrame
         DataFrame used to store the parsed turbostat data.
     df_metrics : pandas.DataFrame
@@ -20,21 +109,32 @@ class TurbostatProcessor:
     
     Methods
     -------
-    __init__(path_turbostat, path_result, window_size)
-        Initializes a new TurbostatProcessor object with input file paths and rolling window size.
+    __init__(path_turbostat, path_result, window_size, columns, stats, float32)
+        Initializes a new TurbostatProcessor object with input file paths, rolling window size and statistics.
+    select_columns(header)
+        Returns the columns to process among the columns of the turbostat output.
     load_data()
         Loads the turbostat CSV data into the `df` DataFrame.
     window()
-        Calculates the rolling average of power consumption (PkgWatt) using the specified window size.
+        Calculates the rolling statistics of the selected columns using the specified window size.
     save_results()
         Saves the calculated power consumption metrics to a CSV result file.
     process_files()
         Orchestrates the entire processing pipeline: loading data, calculating metrics, and saving results.
+    process_stream(chunksize)
+        Processes the turbostat file in chunks, with memory bounded by the chunk and window sizes.
+    follow(interval, idle)
+        Processes the turbostat file while turbostat writes it, appending the results as the lines arrive.
+    stream_columns(header)
+        Returns the columns processed by the streaming modes, which compute the rolling mean only.
+    append_results(file, timestamps, values, header)
+        Appends rows of rolling averages to an open result file.
     """
     
-    def __init__(self, path_turbostat: str, path_result: str, window_size: int):
+    def __init__(self, path_turbostat: str, path_result: str, window_size: int, columns: tuple = ('PkgWatt',),
+                 stats: tuple = ('mean',), float32: bool = False):
         """
-        Initializes the TurbostatProcessor object with input file paths and window size.
+        Initializes the TurbostatProcessor object with input file paths, window size and statistics.
 
         Parameters
         ----------
@@ -44,11 +144,25 @@ class TurbostatProcessor:
             The path where the resulting CSV file will be saved.
         window_size : int
             The rolling window size for calculating the power consumption average.
+        columns : tuple, optional
+            The turbostat columns to process (default is ('PkgWatt',)), ('all',) for every column but the time
+            and CPU topology.
+        stats : tuple, optional
+            The rolling statistics of each column, among 'mean', 'var', 'min' and 'max' (default is ('mean',)).
+        float32 : bool, optional
+            Whether to store the floating-point columns in single precision (default is False). Integer columns
+            are always stored in the smallest integer type that holds them.
         """
         
+        unknown = [stat for stat in stats if stat not in STATS]
+        if unknown:
+            raise ValueError(f"Unknown statistics: {unknown}")
         self._path_turbostat = path_turbostat
         self._path_result = path_result
         self._window_size = window_size
+        self._columns = tuple(columns)
+        self._stats = tuple(stats)
+        self._float32 = float32
         self._df = pd.DataFrame()
         self._df_metrics = pd.DataFrame()
 
@@ -76,6 +190,30 @@ class TurbostatProcessor:
     def window_size(self, size: int) -> None:
         self._window_size = size
 
+    @property
+    def columns(self) -> tuple:
+        return self._columns
+
+    @columns.setter
+    def columns(self, columns: tuple) -> None:
+        self._columns = tuple(columns)
+
+    @property
+    def stats(self) -> tuple:
+        return self._stats
+
+    @stats.setter
+    def stats(self, stats: tuple) -> None:
+        self._stats = tuple(stats)
+
+    @property
+    def float32(self) -> bool:
+        return self._float32
+
+    @float32.setter
+    def float32(self, value: bool) -> None:
+        self._float32 = value
+
     @property
     def df(self) -> pd.DataFrame:
         return self._df
@@ -92,26 +230,70 @@ class TurbostatProcessor:
     def df_metrics(self, metrics: pd.DataFrame) -> None:
         self._df_metrics = metrics
 
+    def select_columns(self, header: list) -> list:
+        """
+        Returns the columns to process among the columns of the turbostat output.
+
+        Parameters
+        ----------
+        header : list
+            The column names of the turbostat output.
+
+        Returns
+        -------
+        list
+            The selected columns, in the order of `columns` or of the output for ('all',).
+
+        Raises
+        ------
+        ValueError
+            If a selected column is not in the turbostat output.
+        """
+
+        if 'all' in self._columns:
+            return [column for column in header if column != TIME_COLUMN and column not in TOPOLOGY_COLUMNS]
+        missing = [column for column in self._columns if column not in header]
+        if missing:
+            raise ValueError(f"Columns not in the turbostat output: {missing}")
+        return list(self._columns)
+
     def load_data(self) -> None:
         """
         Loads the turbostat CSV data into the `df` DataFrame.
 
         This method reads the input turbostat CSV file, parses it, and stores the data into the `df` attribute.
-        The file is expected to be in CSV format with whitespace-separated values.
+        The file is expected to be in CSV format with whitespace-separated values. Only the time, the 'CPU' column
+        and the selected columns are kept, each in the smallest dtype that holds it (see `float32`).
 
         Notes
         -----
         - The file should contain columns such as 'Time_Of_Day_Seconds' and 'PkgWatt'.
+        - Without --Summary, turbostat prints one row per CPU and a summary row with '-' as CPU, and repeats
+          the header line before each interval; the repeated headers are dropped.
         """
         
-        self.df = pd.read_csv(self._path_turbostat, sep='\s+')
+        header = list(pd.read_csv(self._path_turbostat, sep='\s+', nrows=0).columns)
+        columns = self.select_columns(header)
+        usecols = [TIME_COLUMN] + (['CPU'] if 'CPU' in header else []) + columns
+        df = pd.read_csv(self._path_turbostat, sep='\s+', usecols=usecols, dtype={'CPU': str},
+                         na_values={column: ['-'] for column in columns})
+        if not pd.api.types.is_numeric_dtype(df[TIME_COLUMN]):
+            df = df[df[TIME_COLUMN] != TIME_COLUMN].reset_index(drop=True)
+            df[[TIME_COLUMN] + columns] = df[[TIME_COLUMN] + columns].apply(pd.to_numeric)
+
+        for column in columns:
+            if pd.api.types.is_integer_dtype(df[column]):
+                df[column] = pd.to_numeric(df[column], downcast='integer')
+            elif self._float32:
+                df[column] = df[column].astype(np.float32)
+        self.df = df[usecols]
 
     def window(self) -> None:
         """
-        Calculates the rolling average of power consumption (PkgWatt) using the specified window size.
+        Calculates the rolling statistics of the selected columns using the specified window size.
 
-        The method uses the `window_size` attribute to apply a rolling mean to the 'PkgWatt' column 
-        of the `df` DataFrame and stores the results in the `df_metrics` DataFrame.
+        All the columns go through the same rolling window and each statistic is computed for all of them at
+        once. With one row per CPU, the rows of each CPU (and the summary rows) are a separate series.
 
         Parameters
         ----------
@@ -123,12 +305,31 @@ class TurbostatProcessor:
         
         Notes
         -----
-        - The method assumes that the 'PkgWatt' column exists in the `df` DataFrame.
-        - The rolling mean is computed on the 'PkgWatt' column and assigned to `df_metrics['PkgWatt']`.
+        - The results are named after their column for the mean alone ('PkgWatt' by default), and
+          '<column>_<stat>' otherwise, e.g. 'CorWatt_max'.
+        - Statistics are NaN until the window is full, as in `pandas.Series.rolling(window)`.
         """
         
-        self.df_metrics['Timestamp'] = self.df['Time_Of_Day_Seconds']
-        self.df_metrics['PkgWatt'] = self.df['PkgWatt'].rolling(window=self._window_size).mean()
+        columns = [column for column in self.df.columns if column not in (TIME_COLUMN, 'CPU')]
+        if 'CPU' in self.df.columns:
+            rolling = self.df.groupby('CPU', sort=False, dropna=False)[columns].rolling(window=self._window_size)
+        else:
+            rolling = self.df[columns].rolling(window=self._window_size)
+
+        metrics = {'Timestamp': self.df[TIME_COLUMN]}
+        if 'CPU' in self.df.columns:
+            metrics['CPU'] = self.df['CPU']
+        results = {}
+        for stat in self._stats:
+            result = getattr(rolling, stat)()
+            if 'CPU' in self.df.columns:
+                result = result.droplevel(0).reindex(self.df.index)
+            results[stat] = result.astype(np.float32) if self._float32 else result
+        for column in columns:
+            for stat in self._stats:
+                name = column if self._stats == ('mean',) else f'{column}_{stat}'
+                metrics[name] = results[stat][column]
+        self.df_metrics = pd.DataFrame(metrics)
 
     def save_results(self) -> None:
         """
@@ -157,6 +358,140 @@ class TurbostatProcessor:
         self.window()
         self.save_results()
 
+    def stream_columns(self, header: list) -> list:
+        """
+        Returns the columns processed by `process_stream()` and `follow()`, which compute the rolling mean of
+        a single series per column.
+
+        Parameters
+        ----------
+        header : list
+            The column names of the turbostat output.
+
+        Returns
+        -------
+        list
+            The selected columns.
+
+        Raises
+        ------
+        ValueError
+            If other statistics than the mean are selected, or the output has one row per CPU.
+        """
+
+        if self._stats != ('mean',):
+            raise ValueError("Only the rolling mean is computed while streaming, use process_files() for other statistics")
+        if 'CPU' in header:
+            raise ValueError("Turbostat outputs with one row per CPU are not streamed, run turbostat with --Summary or use process_files()")
+        return self.select_columns(header)
+
+    def process_stream(self, chunksize: int = 10000) -> None:
+        """
+        Processes the turbostat file `chunksize` lines at a time and writes the results of each chunk before
+        reading the next one. The rolling averages are kept by a `RollingMean` per column, so the result file
+        matches the one of `process_files()`, to within floating-point rounding, while memory does not depend
+        on the length of the file.
+
+        Parameters
+        ----------
+        chunksize : int
+            The number of lines parsed at once.
+        """
+
+        columns = self.stream_columns(list(pd.read_csv(self._path_turbostat, sep='\s+', nrows=0).columns))
+        means = {column: RollingMean(self._window_size) for column in columns}
+        with open(self._path_result, 'w', newline='') as result:
+            header = True
+            for chunk in pd.read_csv(self._path_turbostat, sep='\s+', usecols=[TIME_COLUMN] + columns,
+                                     na_values={column: ['-'] for column in columns}, chunksize=chunksize):
+                values = {column: [means[column].update(value) for value in chunk[column].tolist()] for column in columns}
+                self.append_results(result, chunk[TIME_COLUMN], values, header)
+                header = False
+            if header:
+                self.append_results(result, [], {column: [] for column in columns}, header)
+
+    def follow(self, interval: float = 1.0, idle: float = None) -> None:
+        """
+        Processes the turbostat `--out` file while turbostat writes it: the lines appended since the last read
+        are parsed every `interval` seconds and their rolling averages appended to the result file, which is
+        flushed so the results are available during the experiment. Repeated header lines are skipped and a
+        partially written line waits for the next read.
+
+        Parameters
+        ----------
+        interval : float
+            The number of seconds between reads of the turbostat file.
+        idle : float, optional
+            The number of seconds without a new line after which the method returns (default is None, it runs
+            until interrupted).
+        """
+
+        waited = 0.0
+        while not os.path.exists(self._path_turbostat):
+            if idle is not None and waited >= idle:
+                return
+            time.sleep(interval)
+            waited += interval
+
+        fields_header = None
+        columns, means = [], {}
+        pending = ''
+        header = True
+        waited = 0.0
+        with open(self._path_turbostat, 'r') as source, open(self._path_result, 'w', newline='') as result:
+            while True:
+                data = source.read()
+                if not data:
+                    if idle is not None and waited >= idle:
+                        return
+                    time.sleep(interval)
+                    waited += interval
+                    continue
+                waited = 0.0
+
+                lines = (pending + data).split('\n')
+                pending = lines.pop()
+                timestamps = []
+                values = {column: [] for column in columns}
+                for line in lines:
+                    fields = line.split()
+                    if not fields or fields == fields_header:
+                        continue
+                    if fields_header is None:
+                        fields_header = fields
+                        columns = self.stream_columns(fields)
+                        means = {column: RollingMean(self._window_size) for column in columns}
+                        values = {column: [] for column in columns}
+                        continue
+                    row = dict(zip(fields_header, fields))
+                    timestamps.append(float(row[TIME_COLUMN]))
+                    for column in columns:
+                        value = math.nan if row[column] == '-' else float(row[column])
+                        values[column].append(means[column].update(value))
+                if fields_header is not None and (timestamps or header):
+                    self.append_results(result, timestamps, values, header)
+                    header = False
+                    result.flush()
+
+    def append_results(self, file, timestamps, values: dict, header: bool) -> None:
+        """
+        Appends rows of rolling averages to the result file, formatted as `save_results()` does.
+
+        Parameters
+        ----------
+        file : file object
+            The result file, open for writing.
+        timestamps : sequence of float
+            The 'Time_Of_Day_Seconds' values of the rows.
+        values : dict
+            The rolling averages at these timestamps, by column.
+        header : bool
+            Whether to write the column names first.
+        """
+
+        rows = pd.DataFrame({'Timestamp': list(timestamps), **values}, columns=['Timestamp'] + list(values))
+        rows.to_csv(file, index=False, header=header)
+
 
 def main():
     """
@@ -166,14 +501,30 @@ def main():
     - path_turbostat: Path to the turbostat input CSV file.
     - path_result: Path to save the resulting output CSV file.
     - window_size: The rolling window size for calculating power consumption averages.
+
+    With --stream the file is processed in chunks, and with --follow it is processed while turbostat writes it,
+    until interrupted. --columns=<c1,c2,...|all> selects the columns (default PkgWatt), --stats=<mean,var,min,max>
+    the rolling statistics (default mean) and --float32 stores the floating-point columns in single precision.
     """
     
-    path_turbostat = sys.argv[1]
-    path_result = sys.argv[2]
-    window_size = int(sys.argv[3])
+    options = dict(arg[2:].partition('=')[::2] for arg in sys.argv[1:] if arg.startswith('--'))
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    path_turbostat = args[0]
+    path_result = args[1]
+    window_size = int(args[2])
+    columns = options['columns'].split(',') if options.get('columns') else ('PkgWatt',)
+    stats = options['stats'].split(',') if options.get('stats') else ('mean',)
 
-    ts = TurbostatProcessor(path_turbostat, path_result, window_size)
-    ts.process_files()
+    ts = TurbostatProcessor(path_turbostat, path_result, window_size, columns, stats, 'float32' in options)
+    if 'follow' in options:
+        try:
+            ts.follow()
+        except KeyboardInterrupt:
+            pass
+    elif 'stream' in options:
+        ts.process_stream()
+    else:
+        ts.process_files()
 
 
 if __name__ == "__main__":
@@ -41,7 +41,7 @@ power_test(){
     run_remote "$HOST1" "while pgrep -x powertop > /dev/null; do sleep 1; done" "$H1_pwrd"
     run_remote "$HOST1" "while pgrep -x turbostat > /dev/null; do sleep 1; done" "$H1_pwrd"
     python3 csv_turbostat.py "$H1_test_dir/$PATH_TURBOSTAT" "$H1_test_dir/$PATH_RESULT_TS" "$WINDOW_SIZE" &
-    python3 csv_powertop.py "$H1_test_dir$PATH_POWERTOP" "$H1_test_dir$PATH_RESULT_PT" "$WINDOW_SIZE"
+    python3 csv_powertop.py "$H1_test_dir$PATH_POWERTOP" "$H1_test_dir$PATH_RESULT_PT" "$WINDOW_SIZE" "$pt_workers"
     run_remote "$HOST1" "while pgrep -x csv_powertop.py > /dev/null; do sleep 1; done" "$H1_pwrd"
     echo "Processing the data at $(date)"
 }
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import math
+import multiprocessing
+import os
+import platform
+import tempfile
+import time
+import numpy as np
+from model_loader import FEATURE_RANGES, FEATURES, METADATA_SUFFIX, CompiledSmallBatches, load_model, metadata_path, predict_rows
+from xapp_metrics import rss_mb
+
+# Measures the cost of every model: load time, memory, single-row latency and batch
+# throughput, as loaded by the xApp (compiled) and with the model's own library:
+#   python3 benchmark_models.py --models 'models/*' --output benchmark.json
+# Each model is measured in a fresh process, so load times include the library imports
+# a model needs and memory is not shared with the models measured before it.
+# --calibrate also measures compiled tree models at every batch size ("trees" mode) and
+# saves in their .meta.json the largest batch size they beat the library at, above which
+# the xApp scores them with the library.
+
+BATCH_SIZES = (1, 16, 256, 4096)
+MODES = {"compiled": (True, None), "library": (False, None), "trees": (True, math.inf)}
+
+
+def random_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    low = np.array([FEATURE_RANGES[name][0] for name in FEATURES], dtype=np.float64)
+    high = np.array([FEATURE_RANGES[name][1] for name in FEATURES], dtype=np.float64)
+    return low + rng.random((n, len(FEATURES))) * (high - low)
+
+
+def measure(model_path, mode="compiled", single_rows=2000, batch_sizes=BATCH_SIZES, min_time=0.2):
+    """
+    Cost of one model in this process. Load times are in ms, memory in MB, latencies in us
+    and throughputs in rows per second.
+    """
+
+    compile, compiled_max_batch = MODES[mode]
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    model = load_model(model_path, compile, compiled_max_batch)
+    load_ms = (time.perf_counter() - start) * 1000
+    rss_after = rss_mb()
+    # Second load, once the libraries are imported and the file is in the page cache
+    start = time.perf_counter()
+    load_model(model_path, compile, compiled_max_batch)
+    reload_ms = (time.perf_counter() - start) * 1000
+
+    rows = random_rows(max(single_rows, max(batch_sizes)))
+    for i in range(20):
+        predict_rows(model, rows[i:i + 1])
+    latencies = np.zeros(single_rows)
+    for i in range(single_rows):
+        start = time.perf_counter()
+        predict_rows(model, rows[i:i + 1])
+        latencies[i] = time.perf_counter() - start
+    latencies *= 1e6
+
+    throughput = {}
+    for size in batch_sizes:
+        batch = rows[:size]
+        calls = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time:
+            predict_rows(model, batch)
+            calls += 1
+            elapsed = time.perf_counter() - start
+        throughput[str(size)] = calls * size / elapsed
+
+    return {"model": os.path.basename(model_path), "path": model_path, "mode": mode, "type": type(model).__name__,
+            "load_ms": load_ms, "reload_ms": reload_ms, "rss_mb": rss_after - rss_before, "process_rss_mb": rss_after,
+            "latency_us": {"p50": float(np.percentile(latencies, 50)), "p99": float(np.percentile(latencies, 99)),
+                           "mean": float(latencies.mean())},
+            "throughput_rows_per_s": throughput}
+
+
+def measure_isolated(model_path, mode="compiled", **options):
+    # measure() in a new interpreter, errors are reported instead of raised
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        try:
+            return executor.submit(measure, model_path, mode, **options).result()
+        except Exception as e:
+            return {"model": os.path.basename(model_path), "path": model_path, "mode": mode, "error": str(e)}
+
+
+def compiled_max_batch(trees, library):
+    # Largest batch size up to which the compiled trees are at least as fast as the library,
+    # 0 when the library is faster even for single rows
+    best = 0
+    for size in sorted(trees["throughput_rows_per_s"], key=int):
+        if trees["throughput_rows_per_s"][size] < library["throughput_rows_per_s"][size]:
+            break
+        best = int(size)
+    return best
+
+
+def save_calibration(model_path, max_batch):
+    path = metadata_path(model_path)
+    stored = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            stored = json.load(f)
+    stored["compiled_max_batch"] = max_batch
+    with open(path, "w") as f:
+        json.dump(stored, f, indent=2)
+    return path
+
+
+def is_tree_model(model_path):
+    # Whether the xApp scores the model by batch size (compiled trees and library)
+    model = load_model(model_path)
+    model = getattr(model, "model", model)
+    return isinstance(model, CompiledSmallBatches)
+
+
+def booster_json(model_path, directory):
+    # XGBoost models saved with joblib are also written as a Booster .json, the other
+    # model format the xApp loads. Returns None for any other model
+    model = load_model(model_path, compile=False)
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    if type(booster).__module__.split(".")[0] != "xgboost":
+        return None
+    path = os.path.join(directory, os.path.splitext(os.path.basename(model_path))[0] + ".json")
+    booster.save_model(path)
+    return path
+
+
+def environment():
+    versions = {"python": platform.python_version(), "numpy": np.__version__}
+    for name in ("sklearn", "xgboost", "joblib"):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            versions[name] = None
+    return {"platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count(), "versions": versions}
+
+
+def format_results(results):
+    sizes = [size for size in next((r["throughput_rows_per_s"] for r in results if "error" not in r), {})]
+    header = f"{'model':<48} {'mode':<8} {'load ms':>9} {'reload ms':>9} {'RSS MB':>7} {'p50 us':>8} {'p99 us':>8}"
+    header += "".join(f" {'rows/s@' + size:>12}" for size in sizes)
+    lines = [header]
+    for r in results:
+        mode = r["mode"]
+        if "error" in r:
+            lines.append(f"{r['model']:<48} {mode:<8} error: {r['error']}")
+            continue
+        line = f"{r['model']:<48} {mode:<8} {r['load_ms']:>9.1f} {r['reload_ms']:>9.1f} {r['rss_mb']:>7.1f} " \
+               f"{r['latency_us']['p50']:>8.1f} {r['latency_us']['p99']:>8.1f}"
+        line += "".join(f" {r['throughput_rows_per_s'][size]:>12.0f}" for size in sizes)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the inference cost of the models')
+    parser.add_argument("--models", type=str, default='models/*', help="Glob pattern of the model files (.pkl, .json, .npz)")
+    parser.add_argument("--modes", type=str, default='compiled,library', help="Comma-separated: compiled (as the xApp loads them), library (--no_compile) and/or trees (tree models compiled for every batch size)")
+    parser.add_argument("--calibrate", action='store_true', help="Save in the .meta.json of each tree model the largest batch size its compiled form is scored at")
+    parser.add_argument("--batch_sizes", type=str, default=','.join(map(str, BATCH_SIZES)), help="Batch sizes of the throughput test as comma-separated string")
+    parser.add_argument("--single_rows", type=int, default=2000, help="Number of single-row predictions timed for the latency percentiles")
+    parser.add_argument("--no_json", action='store_true', help="Do not benchmark XGBoost models in the Booster .json format")
+    parser.add_argument("--output", type=str, default='model_benchmark.json', help="JSON report")
+
+    args = parser.parse_args()
+    modes = args.modes.split(",")
+    if args.calibrate:
+        modes += [mode for mode in ("library", "trees") if mode not in modes]
+    options = {"single_rows": args.single_rows, "batch_sizes": tuple(map(int, args.batch_sizes.split(",")))}
+    paths = sorted(path for path in glob.glob(args.models)
+                   if path.endswith((".pkl", ".json", ".npz")) and not path.endswith(METADATA_SUFFIX))
+    if not paths:
+        print(f"No model matches {args.models}")
+        exit(1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        exported = {}
+        if not args.no_json:
+            for path in [path for path in paths if path.endswith(".pkl")]:
+                json_path = booster_json(path, directory)
+                if json_path is not None:
+                    exported[json_path] = path
+            paths += list(exported)
+
+        results = []
+        calibration = {}
+        for path in paths:
+            tree = path.endswith((".pkl", ".json")) and is_tree_model(path)
+            measured = {}
+            for mode in modes:
+                # The native .npz and lookup table formats have no library form, and only
+                # tree models have a trees mode
+                if (mode == "library" and path.endswith(".npz")) or (mode == "trees" and not tree):
+                    continue
+                print(f"{os.path.basename(path)} ({mode})", flush=True)
+                result = measured[mode] = measure_isolated(path, mode, **options)
+                if path in exported:
+                    result["path"] = exported[path] + " (as Booster .json)"
+                results.append(result)
+            # Models exported to the temporary directory have no metadata to update
+            if args.calibrate and tree and path not in exported and \
+                    not any("error" in measured[mode] for mode in ("trees", "library")):
+                max_batch = compiled_max_batch(measured["trees"], measured["library"])
+                calibration[os.path.basename(path)] = max_batch
+                print(f"{os.path.basename(path)}: compiled up to {max_batch} rows, saved to {save_calibration(path, max_batch)}")
+
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(), "options": options, "results": results}
+    if args.calibrate:
+        report["compiled_max_batch"] = calibration
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(format_results(results))
+    print(f"Report written to {args.output}")
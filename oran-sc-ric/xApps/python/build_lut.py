@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+import numpy as np
+from model_loader import INPUT_RANGES, load_model, predict_rows
+from lookup_table import INTERPOLATIONS, build_table, error_bound
+
+# Builds the lookup table of a model over the whole feature space, for running the xApp
+# with --model <model>.lut.npz without any ML library:
+#   python3 build_lut.py --model models/random_forest_13-03-2025_13-39-50_0.pkl
+
+# Feature columns of the xApp metrics files, in model input order
+FEATURE_COLUMNS = ("Airtime_Norm", "SNR_Norm", "Mcs_Norm")
+
+
+def observed_bounds(pattern, margin):
+    # Range of the model inputs in the metrics files written by the xApp, widened by
+    # `margin` of the span on each side but not below the lower end of the input range
+    rows = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                try:
+                    rows.append([float(row[name]) for name in FEATURE_COLUMNS])
+                except (KeyError, TypeError, ValueError):
+                    continue
+    if not rows:
+        raise ValueError(f"No feature rows found in {pattern}")
+    rows = np.array(rows)
+    low, high = rows.min(axis=0), rows.max(axis=0)
+    span = np.maximum(high - low, 1e-9)
+    low = np.maximum(low - margin * span, [r[0] for r in INPUT_RANGES])
+    return low.tolist(), (high + margin * span).tolist()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute a model over the feature grid')
+    parser.add_argument("--model", type=str, required=True, help="Model file (.pkl or .json)")
+    parser.add_argument("--points", type=str, default='101,131,101', help="Grid points of each model input as comma-separated string")
+    parser.add_argument("--data", type=str, default='', help="Metrics CSV files (glob) to take the grid bounds from, instead of the full input ranges")
+    parser.add_argument("--margin", type=float, default=0.05, help="Fraction of the observed range added on each side with --data")
+    parser.add_argument("--interpolation", type=str, default='linear', choices=INTERPOLATIONS, help="Read the table by multilinear interpolation or nearest grid point")
+    parser.add_argument("--samples", type=int, default=100000, help="Random points used to measure the error against the model")
+    parser.add_argument("--output", type=str, default='', help="Output file (default: <model>.lut.npz next to the model)")
+
+    args = parser.parse_args()
+    points = tuple(map(int, args.points.split(",")))
+    if args.data:
+        low, high = observed_bounds(args.data, args.margin)
+    else:
+        low = [r[0] for r in INPUT_RANGES]
+        high = [r[1] for r in INPUT_RANGES]
+    output = args.output or os.path.splitext(args.model)[0] + ".lut.npz"
+
+    model = load_model(args.model)
+    predict = lambda rows: predict_rows(model, rows)
+
+    start = time.time()
+    table = build_table(predict, low, high, points, args.interpolation)
+    print(f"Evaluated {table.values.size} grid points between {low} and {high} in {time.time() - start:.1f} s")
+
+    errors = {}
+    for interpolation in INTERPOLATIONS:
+        table.interpolation = interpolation
+        errors[interpolation] = error_bound(table, predict, args.samples)
+        print(f"{interpolation}: {errors[interpolation]}")
+    table.interpolation = args.interpolation
+
+    table.save(output, source=os.path.basename(args.model), errors=json.dumps(errors))
+    print(f"Lookup table saved to {output} ({os.path.getsize(output) / 1024:.0f} KB, {args.interpolation} interpolation)")
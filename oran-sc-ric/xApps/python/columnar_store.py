@@ -0,0 +1,266 @@
+import glob
+import importlib.util
+import json
+import os
+import time
+import numpy as np
+
+# Columns stored as fixed-width byte strings, every other column is float64 (NA becomes NaN)
+STRING_COLUMNS = ("E2 Agent ID", "Subscription ID", "Model")
+STRING_WIDTH = 64
+TIMESTAMP_COLUMN = "Timestamp"
+
+
+def arrow_available():
+    # pyarrow is optional, only the Arrow format needs it
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("The Arrow format requires pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+def column_dtype(name):
+    if name in STRING_COLUMNS:
+        return np.dtype("S{}".format(STRING_WIDTH))
+    return np.dtype(np.float64)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class _RotatingWriter:
+    """
+    Common part of the columnar writers: typed columns from the header and segment rotation
+    by size or age. Segments are named <prefix>-<seq>, subclasses write the actual files.
+    """
+
+    def __init__(self, directory, prefix, rotate_bytes=64 * 1024 * 1024, rotate_seconds=3600):
+        self.directory = directory
+        self.prefix = prefix
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.columns = None
+        self.dtypes = None
+        self._seq = 0
+        self._segment_bytes = 0
+        self._segment_start = None
+        os.makedirs(directory, exist_ok=True)
+
+    def write_header(self, header):
+        if self.columns is not None:
+            self._close_segment()
+        self.columns = list(header)
+        self.dtypes = [column_dtype(name) for name in self.columns]
+
+    def write_rows(self, rows):
+        if self.columns is None:
+            raise ValueError("write_header must be called before write_rows")
+        if self._segment_start is None:
+            self._open_segment()
+        arrays = self._sorted(self._to_columns(rows))
+        self._segment_bytes += self._append(arrays)
+        if (self.rotate_bytes and self._segment_bytes >= self.rotate_bytes) or \
+                (self.rotate_seconds and time.time() - self._segment_start >= self.rotate_seconds):
+            self._close_segment()
+
+    def close(self):
+        if self._segment_start is not None:
+            self._close_segment()
+
+    def _to_columns(self, rows):
+        # Short rows (no prediction yet) are padded with NaN
+        arrays = []
+        for i, (name, dtype) in enumerate(zip(self.columns, self.dtypes)):
+            if dtype.kind == "S":
+                values = [str(row[i]).encode() if i < len(row) else b"" for row in rows]
+            else:
+                values = [_to_float(row[i]) if i < len(row) else np.nan for row in rows]
+            arrays.append(np.array(values, dtype=dtype))
+        return arrays
+
+    def _sorted(self, arrays):
+        # Rows are appended in arrival order; a wall-clock step back would leave them unsorted
+        if TIMESTAMP_COLUMN not in self.columns:
+            return arrays
+        ts = arrays[self.columns.index(TIMESTAMP_COLUMN)]
+        if len(ts) < 2 or not (np.diff(ts) < 0).any():
+            return arrays
+        order = np.argsort(ts, kind="stable")
+        return [array[order] for array in arrays]
+
+    def _segment_name(self):
+        return "{}-{:05d}".format(self.prefix, self._seq)
+
+    def _open_segment(self):
+        self._seq += 1
+        self._segment_bytes = 0
+        self._segment_start = time.time()
+        self._open(os.path.join(self.directory, self._segment_name()))
+
+    def _close_segment(self):
+        self._close()
+        self._segment_start = None
+
+
+class NpyColumnarWriter(_RotatingWriter):
+    """
+    Appends each column to its own raw binary file, so a segment can be opened with
+    np.memmap without parsing. A segment is a directory with one file per column and a
+    meta.json describing names and dtypes.
+    """
+
+    def _open(self, path):
+        os.makedirs(path, exist_ok=True)
+        meta = {
+            "columns": [{"name": name, "dtype": dtype.str, "file": "c{:03d}.bin".format(i)}
+                        for i, (name, dtype) in enumerate(zip(self.columns, self.dtypes))],
+            "created": self._segment_start,
+        }
+        with open(os.path.join(path, "meta.json"), "w") as file:
+            json.dump(meta, file)
+        self._files = [open(os.path.join(path, col["file"]), "ab") for col in meta["columns"]]
+
+    def _append(self, arrays):
+        n = 0
+        for file, array in zip(self._files, arrays):
+            file.write(array.tobytes())
+            n += array.nbytes
+        return n
+
+    def flush(self):
+        if self._segment_start is not None:
+            for file in self._files:
+                file.flush()
+
+    def _close(self):
+        for file in self._files:
+            file.close()
+        self._files = []
+
+
+class ArrowColumnarWriter(_RotatingWriter):
+    """
+    Writes each flushed batch of rows as an Arrow record batch into an Arrow IPC file.
+    Requires pyarrow, which is only imported when this writer is used.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._pa = _import_pyarrow()
+        super(ArrowColumnarWriter, self).__init__(*args, **kwargs)
+
+    def write_header(self, header):
+        super(ArrowColumnarWriter, self).write_header(header)
+        pa = self._pa
+        self._schema = pa.schema([(name, pa.string() if dtype.kind == "S" else pa.float64())
+                                  for name, dtype in zip(self.columns, self.dtypes)])
+
+    def _open(self, path):
+        self._file = self._pa.OSFile(path + ".arrow", "wb")
+        self._writer = self._pa.ipc.new_file(self._file, self._schema)
+
+    def _append(self, arrays):
+        pa = self._pa
+        columns = [pa.array(np.char.decode(a), type=pa.string()) if a.dtype.kind == "S" else pa.array(a)
+                   for a in arrays]
+        batch = pa.RecordBatch.from_arrays(columns, schema=self._schema)
+        self._writer.write_batch(batch)
+        return batch.nbytes
+
+    def flush(self):
+        if self._segment_start is not None:
+            self._file.flush()
+
+    def _close(self):
+        self._writer.close()
+        self._file.close()
+
+
+def _open_npy_segment(path, columns=None):
+    with open(os.path.join(path, "meta.json")) as file:
+        meta = json.load(file)
+    wanted = [col for col in meta["columns"] if columns is None or col["name"] in columns
+              or col["name"] == TIMESTAMP_COLUMN]
+    arrays = {}
+    for col in wanted:
+        dtype = np.dtype(col["dtype"])
+        file_path = os.path.join(path, col["file"])
+        n = os.path.getsize(file_path) // dtype.itemsize
+        arrays[col["name"]] = np.memmap(file_path, dtype=dtype, mode="r", shape=(n,)) if n else np.empty(0, dtype)
+    # A segment that is still being written may have one column ahead of another
+    n_rows = min(len(a) for a in arrays.values())
+    return {name: a[:n_rows] for name, a in arrays.items()}
+
+
+def read_time_range(directory, prefix, t_start=None, t_end=None, columns=None):
+    """
+    Returns the rows with t_start <= Timestamp < t_end from the segments of `prefix` in
+    `directory` as a dict of column name to array.
+
+    NumPy segments are memory-mapped, and a segment holding only rows inside the range is
+    returned as memmap views without copying. Arrow segments are memory-mapped through pyarrow
+    and batches outside the range are skipped from their timestamp bounds.
+    """
+
+    t_start = -np.inf if t_start is None else t_start
+    t_end = np.inf if t_end is None else t_end
+    parts = []
+
+    for path in sorted(glob.glob(os.path.join(directory, glob.escape(prefix) + "-[0-9]*"))):
+        if os.path.isdir(path):
+            segment = _open_npy_segment(path, columns)
+        elif path.endswith(".arrow"):
+            segment = _open_arrow_segment(path, t_start, t_end, columns)
+        else:
+            continue
+        ts = segment.get(TIMESTAMP_COLUMN)
+        if ts is None or len(ts) == 0:
+            continue
+        # Each batch of rows is sorted when written and batches come in arrival order, so a
+        # segment is sorted unless the clock stepped back between two batches
+        if (np.diff(ts) < 0).any():
+            mask = (ts >= t_start) & (ts < t_end)
+            if mask.any():
+                parts.append({name: a[mask] for name, a in segment.items()})
+            continue
+        if ts[0] >= t_end:
+            continue
+        lo = np.searchsorted(ts, t_start, side="left")
+        hi = np.searchsorted(ts, t_end, side="left")
+        if hi > lo:
+            parts.append({name: a[lo:hi] for name, a in segment.items()})
+
+    if not parts:
+        return {}
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+
+def _open_arrow_segment(path, t_start, t_end, columns=None):
+    pa = _import_pyarrow()
+
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+    except pa.ArrowInvalid:
+        # Segment still open for writing, its footer is not there yet
+        return {}
+    batches = []
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        ts = batch.column(TIMESTAMP_COLUMN).to_numpy()
+        if len(ts) and ts[-1] >= t_start and ts[0] < t_end:
+            batches.append(batch)
+    if not batches:
+        return {}
+    table = pa.Table.from_batches(batches)
+    names = [n for n in table.column_names if columns is None or n in columns or n == TIMESTAMP_COLUMN]
+    return {name: table.column(name).to_numpy() for name in names}
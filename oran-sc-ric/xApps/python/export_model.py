@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import os
+import time
+import numpy as np
+from model_loader import INPUT_RANGES, CompiledSmallBatches, ScaledInput, load_model, predict_rows, save_native
+
+# Exports compiled tree and linear models as .npz files of plain arrays, loaded without
+# pickle nor any ML library. The xApp picks <model>.npz up instead of <model>.pkl/.json:
+#   python3 export_model.py --model models/random_forest_13-03-2025_13-39-50_0.pkl
+#   python3 export_model.py --model 'models/*.pkl'
+
+
+def export(model_path, output):
+    start = time.perf_counter()
+    model = load_model(model_path)
+    load_time = time.perf_counter() - start
+    save_native(model, output)
+
+    start = time.perf_counter()
+    native = load_model(output)
+    native_time = time.perf_counter() - start
+
+    # The exported model has to predict the same values over the inputs as the xApp computes them
+    rng = np.random.default_rng(0)
+    low, high = np.array(INPUT_RANGES, dtype=float).T
+    X = low + rng.random((10000, 3)) * (high - low)
+    start = time.perf_counter()
+    expected = predict_rows(model, X)
+    model_time = time.perf_counter() - start
+    start = time.perf_counter()
+    error = np.abs(expected - predict_rows(native, X)).max()
+    export_time = time.perf_counter() - start
+    print(f"{model_path} -> {output}: load {load_time * 1000:.1f} ms -> {native_time * 1000:.1f} ms, max abs difference {error:g}")
+
+    library = model.model if isinstance(model, ScaledInput) else model
+    if isinstance(library, CompiledSmallBatches):
+        # The .npz holds the compiled arrays only, so batches over compiled_max_batch rows
+        # are no longer handed to the library
+        print(f"  batches over {library.max_rows} rows are scored compiled, not by the library: "
+              f"{len(X)} rows in {model_time * 1000:.1f} ms -> {export_time * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export models to the native .npz format')
+    parser.add_argument("--model", type=str, required=True, help="Model file (.pkl or .json), or glob pattern")
+    parser.add_argument("--output", type=str, default='', help="Output file for a single model (default: <model>.npz next to the model)")
+
+    args = parser.parse_args()
+    paths = sorted(glob.glob(args.model))
+    if not paths:
+        print(f"No model matches {args.model}")
+        exit(1)
+
+    for path in paths:
+        output = args.output if args.output and len(paths) == 1 else os.path.splitext(path)[0] + ".npz"
+        try:
+            export(path, output)
+        except ValueError as e:
+            print(f"{path}: not exported, {e}")
@@ -0,0 +1,41 @@
+import json
+import urllib.parse
+import ricxappframe.xapp_rest as ricrest
+
+
+def add_endpoint(xapp, method, name, uri, handler):
+    """
+    Registers `handler(path, data)` on the xApp's existing HTTP server (xAppBase.server).
+
+    The handler returns (status, payload) or (status, payload, content_type), where a
+    dict/list payload is sent as JSON and a str payload as plain text. Note that the framework matches URIs by substring, so `uri`
+    must not contain, or be contained in, another URI registered for the same method.
+    """
+
+    def callback(cbname, path, data, ctype):
+        try:
+            result = handler(path, data)
+        except Exception as e:
+            result = (500, {"error": str(e)})
+        status, payload = result[:2]
+        response = ricrest.initResponse(status=status)
+        if isinstance(payload, str):
+            response['ctype'] = result[2] if len(result) > 2 else 'text/plain'
+            response['payload'] = payload
+        else:
+            response['payload'] = json.dumps(payload)
+        return response
+
+    xapp.server.handler.add_handler(xapp.server.handler, method, name, uri, callback)
+
+
+def json_body(data):
+    # POST bodies arrive as raw bytes
+    if not data:
+        return {}
+    return json.loads(data.decode('utf-8') if isinstance(data, bytes) else data)
+
+
+def query_params(path):
+    # Query string of a GET path as a dict, the last value wins for repeated keys
+    return {key: values[-1] for key, values in urllib.parse.parse_qs(urllib.parse.urlparse(path).query).items()}
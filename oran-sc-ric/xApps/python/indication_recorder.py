@@ -0,0 +1,77 @@
+import collections
+import json
+import struct
+import threading
+import time
+
+# Recording file: the magic, a JSON header with the subscription parameters, then one record
+# per RIC indication: arrival time (float64), the lengths of the E2 agent ID, subscription ID,
+# indication header and message (uint16, uint16, uint32, uint32), then those four fields
+MAGIC = b"KPMREC1\n"
+_LENGTH = struct.Struct("<I")
+_RECORD = struct.Struct("<dHHII")
+
+Indication = collections.namedtuple("Indication", ["time", "e2_agent_id", "subscription_id", "indication_hdr", "indication_msg"])
+
+
+class IndicationRecorder:
+    """
+    Writes the RIC indications received by an xApp, as the raw E2SM-KPM header and message
+    bytes given to the subscription callback, with their arrival time. Nothing is decoded,
+    so recording costs one buffered write per indication. `metadata` (report style, UE IDs,
+    metrics...) is stored in the file header for the replay.
+    """
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "wb")
+        header = json.dumps(metadata or {}).encode("utf-8")
+        self._file.write(MAGIC + _LENGTH.pack(len(header)) + header)
+
+    def record(self, e2_agent_id, subscription_id, indication_hdr, indication_msg):
+        arrival = time.time()
+        agent = str(e2_agent_id).encode("utf-8")
+        subscription = str(subscription_id).encode("utf-8")
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(_RECORD.pack(arrival, len(agent), len(subscription), len(indication_hdr), len(indication_msg)))
+            self._file.write(agent + subscription + bytes(indication_hdr) + bytes(indication_msg))
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_recording(path):
+    # Returns the header metadata and the list of recorded indications, in arrival order
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"Not an indication recording: {path}")
+    offset = len(MAGIC)
+    (length,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    metadata = json.loads(data[offset:offset + length].decode("utf-8"))
+    offset += length
+
+    indications = []
+    while offset + _RECORD.size <= len(data):
+        arrival, agent_len, sub_len, hdr_len, msg_len = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        end = offset + agent_len + sub_len + hdr_len + msg_len
+        if end > len(data):
+            # Last record cut short, e.g. the xApp was killed while writing it
+            break
+        agent = data[offset:offset + agent_len].decode("utf-8")
+        offset += agent_len
+        subscription = data[offset:offset + sub_len].decode("utf-8")
+        offset += sub_len
+        indications.append(Indication(arrival, agent, subscription, data[offset:offset + hdr_len], data[offset + hdr_len:end]))
+        offset = end
+    return metadata, indications
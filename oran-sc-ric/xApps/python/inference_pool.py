@@ -0,0 +1,271 @@
+import collections
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from node_shards import score_entries
+from model_loader import load_model, predict_rows
+from xapp_logging import get_logger
+
+log = get_logger("inference_pool")
+
+OVERLOAD_POLICIES = ("drop_oldest", "coalesce")
+
+# Models of a worker process by path, the initial one is loaded by the pool initializer
+_worker_models = {}
+_worker_compile = True
+
+
+def _init_worker(model_path, compile=True):
+    global _worker_compile
+    _worker_compile = compile
+    _worker_models[model_path] = load_model(model_path, compile)
+
+
+def _predict_in_worker(model_path, features):
+    model = _worker_models.get(model_path)
+    if model is None:
+        model = _worker_models[model_path] = load_model(model_path, _worker_compile)
+    return predict_rows(model, features)
+
+
+class ProcessPredictor:
+    """
+    Runs predict_rows in a pool of processes that load their own copy of each model on first
+    use, so heavy models do not compete for the GIL with the receive loop. A prediction that
+    takes longer than `timeout` seconds fails, instead of holding its caller forever.
+    """
+
+    def __init__(self, workers, model_path, compile=True, timeout=30.0):
+        self.timeout = timeout
+        self._executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model_path, compile))
+
+    def predict(self, model_path, features):
+        return self._executor.submit(_predict_in_worker, model_path, features).result(timeout=self.timeout)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class InferencePool:
+    """
+    Moves model inference off the RMR receive thread.
+
+    Batches of (node_id, features, done) entries, as produced by PeriodBatcher, wait in a
+    bounded queue and are scored by `workers` threads with `predict`, which may in turn hand
+    the rows to a ProcessPredictor.
+
+    When the queue is full the oldest batch is dropped. With the "coalesce" policy, a new
+    batch also replaces the entries of the same nodes that are still waiting, so only the
+    latest window of each node is scored. Dropped or replaced entries get done(None), so
+    their rows are still written, without a prediction.
+
+    Whichever worker finishes first, the `done` callbacks run in the order the entries were
+    submitted, so the rows of a node (and the rows of a file) stay in time order. They run
+    outside the pool locks, on one thread at a time: a worker that completes while another
+    thread is delivering leaves its results to that thread and goes back to scoring. An
+    exception raised by a callback is logged and does not stop the others. An entry that
+    never completes holds the later ones back for at most `deliver_timeout` seconds, after
+    which it is given done(None), counted as lost and logged.
+    """
+
+    def __init__(self, predict, workers=1, max_queue=64, policy="drop_oldest", deliver_timeout=10.0):
+        if policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"Unsupported overload policy: {policy}")
+        self.policy = policy
+        self.max_queue = max_queue
+
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.lost = 0
+        self.max_depth = 0
+        self._in_flight = 0
+
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        # Callbacks of the entries not delivered yet, and completions waiting for the ones
+        # submitted before them, by sequence number
+        self.deliver_timeout = deliver_timeout
+        self._next_seq = 0
+        self._delivered = 0
+        self._waiting = {}
+        self._ready = {}
+        self._blocked_since = None
+        self._delivering = False
+        self._deliver_lock = threading.Lock()
+        self._closed = False
+        self._predict = predict
+
+        self._threads = [threading.Thread(target=self._run, name=f"inference-{i}", daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, entries):
+        discarded = []
+        with self._cond:
+            entries = [(node_id, features, self._ordered(done)) for node_id, features, done in entries]
+            self.submitted += len(entries)
+            if self.policy == "coalesce":
+                discarded += self._coalesce({node_id for node_id, features, _ in entries if features is not None})
+            while len(self._queue) >= self.max_queue:
+                batch = self._queue.popleft()
+                self.dropped += len(batch)
+                discarded += batch
+            self._queue.append(list(entries))
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._cond.notify()
+
+        for _, _, done in discarded:
+            done(None)
+
+    def _ordered(self, done):
+        # Called in submission order, under the queue lock
+        seq = self._next_seq
+        self._next_seq += 1
+        with self._deliver_lock:
+            self._waiting[seq] = done
+        return lambda scores: self._complete(seq, scores)
+
+    def _complete(self, seq, scores):
+        with self._deliver_lock:
+            # Late completions of skipped entries, and second completions, are ignored
+            if seq < self._delivered or seq in self._ready:
+                return
+            self._ready[seq] = scores
+        self._deliver()
+
+    def _deliver(self, skip_all=False):
+        with self._deliver_lock:
+            if self._delivering:
+                return
+            self._delivering = True
+        while True:
+            with self._deliver_lock:
+                run = self._pop_run(skip_all)
+                if not run:
+                    self._delivering = False
+                    return
+            for done, scores in run:
+                try:
+                    done(scores)
+                except Exception as e:
+                    log.error(f"Error handling a prediction: {e}")
+
+    def _pop_run(self, skip_all):
+        # Under the deliver lock: the callbacks that can run now, in order
+        run = []
+        while self._delivered in self._ready:
+            run.append((self._waiting.pop(self._delivered), self._ready.pop(self._delivered)))
+            self._delivered += 1
+        if not self._ready:
+            self._blocked_since = None
+            if skip_all and self._waiting:
+                run += self._skip(max(self._waiting) + 1)
+            return run
+        now = time.monotonic()
+        if self._blocked_since is None:
+            self._blocked_since = now
+        if skip_all or now - self._blocked_since >= self.deliver_timeout:
+            run += self._skip(min(self._ready))
+            self._blocked_since = None
+            while self._delivered in self._ready:
+                run.append((self._waiting.pop(self._delivered), self._ready.pop(self._delivered)))
+                self._delivered += 1
+        return run
+
+    def _skip(self, seq):
+        # Entries before `seq` that never completed get no prediction
+        skipped = [(self._waiting.pop(s), None) for s in range(self._delivered, seq) if s in self._waiting]
+        self._delivered = seq
+        if skipped:
+            self.lost += len(skipped)
+            log.error(f"{len(skipped)} entries never completed after {self.deliver_timeout} s, their rows are written without a prediction")
+        return skipped
+
+    def _coalesce(self, node_ids):
+        # Remove the queued entries of the given nodes, batches left empty are removed too
+        discarded = []
+        for batch in self._queue:
+            keep = []
+            for entry in batch:
+                if entry[0] in node_ids and entry[1] is not None:
+                    discarded.append(entry)
+                else:
+                    keep.append(entry)
+            batch[:] = keep
+        self.coalesced += len(discarded)
+        if discarded:
+            self._queue = collections.deque(batch for batch in self._queue if batch)
+        return discarded
+
+    def _run(self):
+        while True:
+            with self._cond:
+                idle = False
+                while not self._queue and not self._closed and not idle:
+                    idle = not self._cond.wait(self.deliver_timeout)
+                if self._closed and not self._queue:
+                    return
+                if not self._queue:
+                    batch = None
+                else:
+                    batch = self._queue.popleft()
+                    self._in_flight += 1
+
+            if batch is None:
+                # Nothing completes while idle, so an entry that never completes is skipped here
+                self._deliver()
+                continue
+
+            # Entries already handed their scores when the batch fails are not completed twice
+            finished = set()
+            entries = [(node_id, features, self._tracked(finished, i, done)) for i, (node_id, features, done) in enumerate(batch)]
+            try:
+                score_entries(self._predict, entries)
+            except Exception as e:
+                log.error(f"Error in model inference: {e}")
+                failed = [done for i, (_, _, done) in enumerate(batch) if i not in finished]
+                with self._cond:
+                    self.errors += len(failed)
+                for done in failed:
+                    done(None)
+
+            with self._cond:
+                self._in_flight -= 1
+                self.completed += len(batch)
+
+    @staticmethod
+    def _tracked(finished, i, done):
+        def complete(scores):
+            finished.add(i)
+            done(scores)
+        return complete
+
+    def queue_depth(self):
+        return len(self._queue)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_depth,
+                "in_flight": self._in_flight,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "lost": self.lost,
+            }
+
+    def close(self, timeout=10.0):
+        # Score what is still queued, then stop the workers
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        # Whatever never completed is written without a prediction
+        self._deliver(skip_all=True)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import resource
+import time
+import numpy as np
+import oranor_xapp
+from indication_recorder import Indication
+from offline_xapp import create_offline
+from replay_indications import RecordedClock, format_report, replay
+from xapp_logging import setup_logging_from_args
+from xapp_metrics import rss_mb
+
+# Generates E2SM-KPM indications already decoded, for any number of E2 nodes and UEs, and
+# drives the xApp with them in-process to see how throughput, latency and memory scale:
+#   python3 kpm_load_generator.py --nodes 8 --ues 500 --kpm_report_style 4 --duration 120 --speed 0 --model models/<model>.pkl
+
+# Metrics the generator knows, the new srsRAN metrics included
+METRICS = ("RRU.PrbTotUl", "RRU.PrbAvailUl", "RRU.PrbTotDl", "RRU.PrbAvailDl", "McsUl", "McsDl", "SNR", "PCI",
+           "BrateUl", "BrateDl", "NofOKUl", "NofOKDl", "NofNOKUl", "NofNOKDl", "BSR", "BSDl", "TA", "PHR", "RI",
+           "DRB.UEThpUl", "DRB.UEThpDl", "DRB.RlcSduTransmittedVolumeDL")
+
+
+class DecodedKpm:
+    # Stands for the E2SM-KPM codec of the xApp when the indications are generated decoded
+
+    def set_ran_func_id(self, ran_func_id):
+        pass
+
+    def extract_hdr_info(self, indication_hdr):
+        return indication_hdr
+
+    def extract_meas_data(self, indication_msg):
+        return indication_msg
+
+
+class KpmLoadGenerator:
+    """
+    Indications of `n_nodes` E2 nodes with `n_ues` UEs each, every `period` seconds, in the
+    structure returned by the E2SM-KPM codec for the given report style (node-level
+    "measData" for styles 1 and 2, "ueMeasData" per UE for styles 3 to 5).
+
+    Each UE follows a slow random walk of its SNR and uplink load, the other metrics are
+    derived from them (MCS from SNR, bitrate from PRBs and MCS, ...), so the values stay in
+    realistic ranges and correlated. All UEs of a node are updated at once with NumPy.
+    """
+
+    def __init__(self, n_nodes=1, n_ues=1, kpm_report_style=4, metrics=METRICS, period=1.0, granul_period=1.0, seed=0):
+        unknown = [name for name in metrics if name not in METRICS]
+        if unknown:
+            raise ValueError(f"Unknown metrics: {unknown}")
+        if kpm_report_style not in (1, 2, 3, 4, 5):
+            raise ValueError(f"Unsupported report style: {kpm_report_style}")
+        self.kpm_report_style = kpm_report_style
+        # Style 3 carries a single metric, as subscribed by the xApp
+        self.metrics = list(metrics[:1]) if kpm_report_style == 3 else list(metrics)
+        self.period = period
+        self.samples = max(1, int(round(period / granul_period)))
+        self.granul_period = int(granul_period * 1000)
+        self.node_ids = [f"gnbd_001_001_{i:08x}_0" for i in range(n_nodes)]
+        self.ue_ids = list(range(n_ues))
+        self._rng = np.random.default_rng(seed)
+
+        shape = (n_nodes, n_ues)
+        self._snr = self._rng.uniform(5, 35, shape)
+        self._load = self._rng.uniform(0, 1, shape)
+        self._ta = self._rng.uniform(0, 2000, shape)
+        self._ri = self._rng.integers(1, 3, shape)
+        self._pci = self._rng.integers(0, 1008, n_nodes)
+
+    def _step(self):
+        # Mean-reverting random walks, one step per granularity period
+        rng = self._rng
+        self._snr += 0.1 * (20 - self._snr) + rng.normal(0, 1.5, self._snr.shape)
+        np.clip(self._snr, 0, 40, out=self._snr)
+        self._load += 0.2 * (0.5 - self._load) + rng.normal(0, 0.1, self._load.shape)
+        np.clip(self._load, 0, 1, out=self._load)
+
+    def _sample(self):
+        # One granularity period of every metric, as (n_nodes, n_ues) arrays
+        self._step()
+        rng = self._rng
+        n_ues = len(self.ue_ids)
+        snr = self._snr
+        share = self._load / max(n_ues, 1)
+        prb_ul = np.round(100 * share, 2)
+        prb_dl = np.round(np.clip(100 * share * 1.5, 0, 100), 2)
+        mcs_ul = np.clip(np.round(0.8 * snr - 1 + rng.normal(0, 1, snr.shape)), 0, 28)
+        mcs_dl = np.clip(mcs_ul + 2, 0, 28)
+        brate_ul = np.round(prb_ul * (mcs_ul + 1) * 5.0, 1)
+        brate_dl = np.round(prb_dl * (mcs_dl + 1) * 8.0, 1)
+        nok_rate = 1 / (1 + np.exp(snr - 5))
+        ok_ul = np.round(prb_ul * 10)
+        ok_dl = np.round(prb_dl * 10)
+        return {
+            "RRU.PrbTotUl": prb_ul, "RRU.PrbAvailUl": 100 - prb_ul,
+            "RRU.PrbTotDl": prb_dl, "RRU.PrbAvailDl": 100 - prb_dl,
+            "McsUl": mcs_ul, "McsDl": mcs_dl, "SNR": np.round(snr, 1),
+            "PCI": np.broadcast_to(self._pci[:, None], snr.shape),
+            "BrateUl": brate_ul, "BrateDl": brate_dl,
+            "NofOKUl": ok_ul, "NofOKDl": ok_dl,
+            "NofNOKUl": np.round(ok_ul * nok_rate), "NofNOKDl": np.round(ok_dl * nok_rate),
+            "BSR": np.round(self._load * rng.uniform(0, 100000, snr.shape)),
+            "BSDl": np.round(self._load * rng.uniform(0, 150000, snr.shape)),
+            "TA": np.round(self._ta), "PHR": np.round(40 - self._ta / 50 - 10 * self._load),
+            "RI": self._ri,
+            "DRB.UEThpUl": brate_ul, "DRB.UEThpDl": brate_dl,
+            "DRB.RlcSduTransmittedVolumeDL": np.round(brate_dl * self.granul_period / 1000),
+        }
+
+    @staticmethod
+    def _cell(name, values):
+        # Node-level value of a metric from its per-UE values
+        if name in ("SNR", "McsUl", "McsDl", "PCI", "TA", "PHR", "RI"):
+            return np.round(values.mean(axis=-1), 1)
+        total = values.sum(axis=-1)
+        if name.startswith("RRU.PrbAvail"):
+            # Per-UE values are 100 minus the UE's PRBs, the cell has 100 minus all of them
+            return 100 - np.clip(100 * values.shape[-1] - total, 0, 100)
+        if name.startswith("RRU.PrbTot"):
+            return np.clip(total, 0, 100)
+        return total
+
+    def indications(self, start=0.0, n_periods=None):
+        """
+        Yields the Indication of every node for each period, from time `start`, forever or
+        for `n_periods` periods. Values are generated one period at a time.
+        """
+
+        k = 0
+        while n_periods is None or k < n_periods:
+            samples = [self._sample() for _ in range(self.samples)]
+            now = start + k * self.period
+            for n, node_id in enumerate(self.node_ids):
+                hdr = {"colletStartTime": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now)), "fileFormatversion": None,
+                       "senderName": None, "senderType": None, "vendorName": None}
+                yield Indication(now, node_id, f"sub-{n}", hdr, self._meas_data(samples, n))
+            k += 1
+
+    def _meas_data(self, samples, n):
+        if self.kpm_report_style == 1:
+            meas = {name: [v.item() for v in (self._cell(name, s[name][n]) for s in samples)] for name in self.metrics}
+            return {"measData": meas, "granulPeriod": self.granul_period}
+        if self.kpm_report_style == 2:
+            meas = {name: [s[name][n, 0].item() for s in samples] for name in self.metrics}
+            return {"measData": meas, "granulPeriod": self.granul_period}
+
+        # Styles 3 to 5, lists of per-UE values converted once per metric
+        columns = {name: [s[name][n].tolist() for s in samples] for name in self.metrics}
+        ue_meas = {}
+        for u, ue_id in enumerate(self.ue_ids):
+            meas = {name: [column[u] for column in columns[name]] for name in self.metrics}
+            ue_meas[ue_id] = {"measData": meas, "granulPeriod": self.granul_period}
+        return {"ueMeasData": ue_meas}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Drive the xApp with synthetic KPM indications')
+    parser.add_argument("--nodes", type=int, default=1, help="Number of E2 nodes")
+    parser.add_argument("--ues", type=int, default=1, help="Number of UEs per E2 node")
+    parser.add_argument("--period", type=float, default=1.0, help="Report period in seconds")
+    parser.add_argument("--granul_period", type=float, default=1.0, help="Granularity period in seconds, values per metric = period / granul_period")
+    parser.add_argument("--duration", type=float, default=120.0, help="Simulated time in seconds")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 runs in real time, N times faster, 0 as fast as possible")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated values")
+    parser.add_argument("--report", type=str, default='', help="Append the report as one JSON line to this file")
+    oranor_xapp.add_arguments(parser)
+    parser.set_defaults(http_server_port=0, log_level='WARNING', kpm_report_style=4)
+
+    args = parser.parse_args()
+    oranor_xapp.check_arguments(parser, args)
+    setup_logging_from_args(args)
+    metrics = args.metrics.split(",")
+    generator = KpmLoadGenerator(args.nodes, args.ues, args.kpm_report_style, metrics, args.period, args.granul_period, args.seed)
+
+    rss_start = rss_mb()
+    xapp = create_offline(oranor_xapp.MyXapp, *oranor_xapp.xapp_arguments(args))
+    xapp.e2sm_kpm = DecodedKpm()
+    xapp.batcher.n_nodes = args.nodes
+    xapp.clock = clock = RecordedClock()
+    rss_xapp = rss_mb()
+    ue_id = generator.ue_ids[0] if args.kpm_report_style == 2 else None
+    callback = lambda agent, sub, hdr, msg: xapp.my_subscription_callback(agent, sub, hdr, msg, args.kpm_report_style, ue_id)
+
+    n_periods = int(args.duration / args.period)
+    report = replay(generator.indications(time.time(), n_periods), callback, args.speed, clock)
+    start = time.perf_counter()
+    xapp.close()
+    report["drain"] = time.perf_counter() - start
+    report["stages"] = xapp.stage_latency.summary()
+    report.update({"nodes": args.nodes, "ues": args.ues, "kpm_report_style": args.kpm_report_style, "metrics": metrics,
+                   "period": args.period, "rss_start_mb": rss_start, "rss_xapp_mb": rss_xapp, "rss_end_mb": rss_mb(),
+                   "rss_peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024})
+
+    print(format_report(report))
+    print(f"Memory: {rss_start:.1f} MB before the xApp, {rss_xapp:.1f} MB after its creation, {report['rss_end_mb']:.1f} MB at the end (peak {report['rss_peak_mb']:.1f} MB)")
+    if args.report:
+        with open(args.report, "a") as f:
+            f.write(json.dumps(report) + "\n")
@@ -0,0 +1,54 @@
+import numpy as np
+
+
+class LinearPredictor:
+    """
+    A linear model reduced to one weight vector and a bias, with the input scaling of the
+    model folded in: predict(X) = X @ weights + bias, for a single row or a whole batch.
+    """
+
+    def __init__(self, weights, bias):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return X @ self.weights + self.bias
+
+    def arrays(self):
+        # Everything needed to rebuild the model, as plain arrays for np.savez
+        return {"format": "linear", "weights": self.weights, "bias": self.bias}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays["weights"], float(arrays["bias"]))
+
+
+def compile_linear(model, scale=1.0, offset=0.0):
+    """
+    Returns a LinearPredictor for a fitted sklearn linear regressor (LinearRegression, Ridge,
+    Lasso, ElasticNet, HuberRegressor...) fed with `X * scale + offset`, or None when `model`
+    is not a single-output linear model.
+
+    model(X * scale + offset) = (X * scale + offset) @ coef + intercept
+                              = X @ (coef * scale) + (offset @ coef + intercept)
+    """
+
+    if not type(model).__module__.startswith("sklearn.linear_model"):
+        return None
+    coef = getattr(model, "coef_", None)
+    intercept = getattr(model, "intercept_", None)
+    if coef is None or intercept is None:
+        return None
+    coef = np.asarray(coef, dtype=np.float64)
+    intercept = np.ravel(np.asarray(intercept, dtype=np.float64))
+    if coef.ndim == 2 and coef.shape[0] == 1:
+        coef = coef[0]
+    if coef.ndim != 1 or len(intercept) != 1:
+        return None
+
+    scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), coef.shape)
+    offset = np.broadcast_to(np.asarray(offset, dtype=np.float64), coef.shape)
+    return LinearPredictor(coef * scale, offset @ coef + intercept[0])
@@ -0,0 +1,106 @@
+import numpy as np
+from xapp_logging import get_logger
+
+log = get_logger("lookup_table")
+
+INTERPOLATIONS = ("linear", "nearest")
+
+
+class LookupTable:
+    """
+    Predictions of a model precomputed over a regular grid of the feature space, read back
+    by nearest grid point or by multilinear interpolation between the 2^d surrounding points.
+
+    `low` and `high` are the grid bounds of each feature and `values` holds one prediction
+    per grid point, shape (points of feature 0, points of feature 1, ...). Features outside
+    the grid are clipped to its bounds; such rows are counted in `clipped` and logged, as
+    their predictions can be far from the model's. Only NumPy is needed to predict.
+    """
+
+    def __init__(self, low, high, values, interpolation="linear"):
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"Unsupported interpolation: {interpolation}")
+        self.low = np.asarray(low, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.values = np.asarray(values)
+        self.interpolation = interpolation
+        self.shape = np.array(self.values.shape)
+        self._step = (self.high - self.low) / (self.shape - 1)
+        self._flat = self.values.ravel()
+        # Offset in the flat array of one step along each feature
+        self._strides = np.array([int(np.prod(self.shape[i + 1:])) for i in range(len(self.shape))])
+        # Flat offsets of the corners of a grid cell, with the bits of the corner index
+        # telling which features take the upper point
+        self._corners = np.array([[(c >> (len(self.shape) - 1 - i)) & 1 for i in range(len(self.shape))]
+                                  for c in range(2 ** len(self.shape))], dtype=bool)
+        self._corner_offsets = self._corners.astype(np.int64) @ self._strides
+        self.clipped = 0
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        outside = int(((X < self.low) | (X > self.high)).any(axis=1).sum())
+        if outside:
+            self._count_clipped(X, outside)
+        position = (np.clip(X, self.low, self.high) - self.low) / self._step
+
+        if self.interpolation == "nearest":
+            index = np.minimum(np.rint(position).astype(np.int64), self.shape - 1)
+            return self._flat[index @ self._strides].astype(np.float64)
+
+        # Lower corner of the cell, kept one point below the upper bound of each feature
+        cell = np.minimum(np.floor(position).astype(np.int64), self.shape - 2)
+        fraction = position - cell
+        # (rows, corners) weights and values, all corners at once
+        weights = np.where(self._corners, fraction[:, None, :], 1.0 - fraction[:, None, :]).prod(axis=2)
+        values = self._flat[(cell @ self._strides)[:, None] + self._corner_offsets]
+        return (weights * values).sum(axis=1)
+
+    def _count_clipped(self, X, outside):
+        # Logged the first time and then at every power of ten rows, not on every batch
+        before = self.clipped
+        self.clipped += outside
+        if before == 0 or np.floor(np.log10(self.clipped)) > np.floor(np.log10(before)):
+            log.warning(f"{self.clipped} rows outside the lookup table bounds {self.low.tolist()} - "
+                        f"{self.high.tolist()} clipped so far, e.g. {X[((X < self.low) | (X > self.high)).any(axis=1)][0].tolist()}")
+
+    def save(self, path, **info):
+        # Compact .npz (float32 values), loadable without pickle
+        np.savez_compressed(path, format="lut", low=self.low, high=self.high, values=self.values,
+                            interpolation=self.interpolation, **info)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays["low"], arrays["high"], arrays["values"], str(arrays["interpolation"]))
+
+
+def build_table(predict, low, high, points, interpolation="linear", batch_rows=65536):
+    """
+    Evaluates predict(rows) -> one value per row over the regular grid with `points` values
+    per feature between `low` and `high`, and returns the LookupTable.
+    """
+
+    axes = [np.linspace(lo, hi, n) for lo, hi, n in zip(low, high, points)]
+    grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(axes))
+    values = np.empty(len(grid), dtype=np.float32)
+    for start in range(0, len(grid), batch_rows):
+        values[start:start + batch_rows] = predict(grid[start:start + batch_rows])
+    return LookupTable(low, high, values.reshape(points), interpolation)
+
+
+def error_bound(table, predict, n_samples=100000, seed=0):
+    """
+    Absolute error of the table against predict on random points of the grid volume, the
+    same points for every call with the same seed.
+    """
+
+    rng = np.random.default_rng(seed)
+    X = table.low + rng.random((n_samples, len(table.low))) * (table.high - table.low)
+    error = np.abs(table.predict(X) - predict(X))
+    return {
+        "max_abs_error": float(error.max()),
+        "p99_abs_error": float(np.percentile(error, 99)),
+        "mean_abs_error": float(error.mean()),
+        "samples": n_samples,
+    }
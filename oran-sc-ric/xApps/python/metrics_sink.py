@@ -0,0 +1,125 @@
+import csv
+import queue
+import threading
+import time
+from xapp_logging import get_logger
+
+log = get_logger("metrics_sink")
+
+_HEADER = 0
+_ROW = 1
+_STOP = 2
+
+
+class CsvRowWriter:
+    """
+    Keeps a single CSV file open for the lifetime of the xApp.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, mode='w', newline='')
+        self._writer = csv.writer(self._file)
+
+    def write_header(self, header):
+        self._writer.writerow(header)
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class MetricsSink:
+    """
+    Bounded queue in front of a row writer, drained by a background thread.
+
+    `write` never blocks: when the queue is full the row is dropped and counted, so a slow
+    disk cannot stall the RMR receive path. It may be called from several threads (inference
+    workers, shadow scoring), the drop count is kept under a lock. Rows are handed to the writer in batches of
+    `flush_rows`, or after `flush_interval` seconds, whichever comes first.
+    """
+
+    def __init__(self, writer, max_queue=10000, flush_rows=100, flush_interval=1.0):
+        self.writer = writer
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self._dropped_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="metrics-sink", daemon=True)
+        self._thread.start()
+
+    def write_header(self, header):
+        # The header must not be lost, so wait for room if the queue is full
+        self._queue.put((_HEADER, header))
+
+    def write(self, row):
+        try:
+            self._queue.put_nowait((_ROW, row))
+            return True
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            return False
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def close(self, timeout=10.0):
+        # Drain everything queued so far, then close the writer
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((_STOP, None))
+        self._thread.join(timeout)
+        if self.dropped:
+            log.warning("Metrics sink dropped {} rows (queue full)".format(self.dropped))
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        running = True
+        while running:
+            try:
+                kind, payload = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                kind = None
+
+            if kind == _ROW:
+                batch.append(payload)
+            elif kind == _HEADER:
+                self._write(batch)
+                batch = []
+                self.writer.write_header(payload)
+            elif kind == _STOP:
+                running = False
+
+            if len(batch) >= self.flush_rows or time.monotonic() >= deadline or not running:
+                self._write(batch)
+                batch = []
+                self._flush()
+                deadline = time.monotonic() + self.flush_interval
+
+        self.writer.close()
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            self.writer.write_rows(batch)
+            self.written += len(batch)
+        except Exception as e:
+            log.error(f"Error writing metrics: {e}")
+
+    def _flush(self):
+        try:
+            self.writer.flush()
+        except Exception as e:
+            log.error(f"Error flushing metrics: {e}")
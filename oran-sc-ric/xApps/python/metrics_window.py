@@ -0,0 +1,106 @@
+import math
+import numpy as np
+from xapp_logging import get_logger
+
+log = get_logger("metrics_window")
+
+
+class MetricsWindow:
+    """
+    Fixed-capacity, time-indexed ring buffer of metric samples.
+
+    Samples older than `horizon` seconds (relative to the newest sample) are evicted on every
+    push, and a running sum per column is kept so the windowed mean is available in O(1)
+    without copying the stored samples. The capacity is sized from the report period; when
+    samples come faster than that and the buffer fills up within the horizon, it doubles
+    instead of evicting a sample still inside the window.
+    """
+
+    # The first growth is logged, later ones (other windows, other nodes) are not
+    _warned = False
+
+    def __init__(self, n_cols, horizon, capacity=None, report_period=1.0):
+        self.n_cols = n_cols
+        self.horizon = horizon
+        if capacity is None:
+            # Room for twice the expected number of reports in the horizon, so jitter in the
+            # report period never evicts a sample that is still inside the window.
+            capacity = 2 * int(math.ceil(horizon / report_period)) + 2
+        self.capacity = capacity
+
+        self._values = np.zeros((capacity, n_cols), dtype=np.float64)
+        self._ts = np.zeros(capacity, dtype=np.float64)
+        self._sums = np.zeros(n_cols, dtype=np.float64)
+        self._mean = np.zeros(n_cols, dtype=np.float64)
+        self._head = 0  # index of the oldest sample
+        self._count = 0
+        self._pushes = 0
+
+    def __len__(self):
+        return self._count
+
+    def push(self, ts, values):
+        # Evict samples that fall out of the window of the incoming one
+        while self._count and (ts - self._ts[self._head]) > self.horizon:
+            self._pop_oldest()
+        if self._count == self.capacity:
+            self._grow()
+
+        tail = (self._head + self._count) % self.capacity
+        self._values[tail] = values
+        self._ts[tail] = ts
+        self._sums += self._values[tail]
+        self._count += 1
+
+        # Recompute the sums from the stored samples once per lap to bound float drift
+        self._pushes += 1
+        if self._pushes % self.capacity == 0:
+            self._resum()
+
+    def _grow(self):
+        idx = (self._head + np.arange(self._count)) % self.capacity
+        if not MetricsWindow._warned:
+            MetricsWindow._warned = True
+            log.warning(f"Metrics window of {self.horizon} s full with {self.capacity} samples, reports come "
+                        f"faster than the expected period: growing it to {2 * self.capacity}")
+        self.capacity *= 2
+        values = np.zeros((self.capacity, self.n_cols), dtype=np.float64)
+        ts = np.zeros(self.capacity, dtype=np.float64)
+        values[:self._count] = self._values[idx]
+        ts[:self._count] = self._ts[idx]
+        self._values, self._ts, self._head = values, ts, 0
+
+    def _pop_oldest(self):
+        self._sums -= self._values[self._head]
+        self._head = (self._head + 1) % self.capacity
+        self._count -= 1
+        if self._count == 0:
+            self._sums[:] = 0.0
+
+    def _resum(self):
+        idx = (self._head + np.arange(self._count)) % self.capacity
+        np.sum(self._values[idx], axis=0, out=self._sums)
+
+    @property
+    def oldest_ts(self):
+        return self._ts[self._head]
+
+    @property
+    def newest_ts(self):
+        return self._ts[(self._head + self._count - 1) % self.capacity]
+
+    def span(self):
+        # Time covered by the samples currently in the window
+        if self._count < 2:
+            return 0.0
+        return self.newest_ts - self.oldest_ts
+
+    def mean(self):
+        # Returns an internal array that is overwritten on the next call
+        np.divide(self._sums, self._count, out=self._mean)
+        return self._mean
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+        self._sums[:] = 0.0
@@ -0,0 +1,171 @@
+import os
+import json
+import numpy as np
+from tree_compiler import CompiledTreeEnsemble, compile_model
+from linear_compiler import LinearPredictor, compile_linear
+from lookup_table import LookupTable
+
+# Model input features, in order, and the range of each one used for min-max normalization
+FEATURES = ("airtime", "snr", "mcs_ul")
+FEATURE_RANGES = {"airtime": (0, 1), "snr": (0, 65), "mcs_ul": (0, 28)}
+# Range of each model input as the xApp feeds it (see feature_matrix in oranor_xapp.py),
+# used as the default lookup-table grid. The xApp keeps the column order the models were
+# trained with, so its first input is McsUl / 100 and its third RRU.PrbTotUl in percent
+INPUT_RANGES = ((0, 1), (0, 65), (0, 100))
+
+METADATA_SUFFIX = ".meta.json"
+
+# Largest batch scored by a compiled tree model when its metadata has no calibrated value
+# (see benchmark_models.py --calibrate), larger batches go to the model's own library
+COMPILED_MAX_BATCH = 8
+
+# Models stored as plain arrays in a .npz file, by the "format" entry of the file
+NATIVE_FORMATS = {"trees": CompiledTreeEnsemble, "linear": LinearPredictor, "lut": LookupTable}
+
+
+def metadata_path(model_path):
+    return os.path.splitext(model_path)[0] + METADATA_SUFFIX
+
+
+def load_metadata(model_path):
+    """
+    Metadata of a model, read from <model>.meta.json next to the model file when it exists:
+
+        {"feature_ranges": {"snr": [0, 65], ...}, "normalized": false, "compiled_max_batch": 64}
+
+    `feature_ranges` overrides the default range of some features. `normalized` is true
+    when the model was trained on features min-max normalized to [0, 1], and false (the
+    default) when it takes the features in their own units, as the xApp produces them.
+    `compiled_max_batch` is the largest batch the compiled form of a tree model scores
+    faster than its library, as measured by benchmark_models.py --calibrate.
+    """
+
+    metadata = {"feature_ranges": dict(FEATURE_RANGES), "normalized": False, "compiled_max_batch": COMPILED_MAX_BATCH}
+    path = metadata_path(model_path)
+    if os.path.exists(path):
+        with open(path) as f:
+            stored = json.load(f)
+        metadata["feature_ranges"].update({name: tuple(r) for name, r in stored.get("feature_ranges", {}).items()})
+        metadata["normalized"] = bool(stored.get("normalized", False))
+        metadata["compiled_max_batch"] = int(stored.get("compiled_max_batch", COMPILED_MAX_BATCH))
+    return metadata
+
+
+def input_transform(metadata):
+    # (scale, offset) arrays so that model input = features * scale + offset
+    if not metadata["normalized"]:
+        return np.ones(len(FEATURES)), np.zeros(len(FEATURES))
+    low = np.array([metadata["feature_ranges"][name][0] for name in FEATURES], dtype=np.float64)
+    high = np.array([metadata["feature_ranges"][name][1] for name in FEATURES], dtype=np.float64)
+    return 1.0 / (high - low), -low / (high - low)
+
+
+class ScaledInput:
+    # A model trained on normalized features, fed with the xApp features
+
+    def __init__(self, model, scale, offset):
+        self.model = model
+        self.scale = scale
+        self.offset = offset
+
+    def predict(self, X):
+        return predict_rows(self.model, np.asarray(X, dtype=np.float64) * self.scale + self.offset)
+
+
+class CompiledSmallBatches:
+    # A tree model scored in its compiled form up to max_rows rows, which saves the per-call
+    # overhead of the library, and by the library itself for larger batches, where its
+    # native code is faster than walking the compiled arrays with NumPy
+
+    def __init__(self, compiled, library, max_rows):
+        self.compiled = compiled
+        self.library = library
+        self.max_rows = max_rows
+
+    def predict(self, X):
+        if len(X) <= self.max_rows:
+            return self.compiled.predict(X)
+        return predict_rows(self.library, X)
+
+
+def load_model(model_path, compile=True, compiled_max_batch=None):
+    # .pkl: joblib dump of a fitted sklearn/XGBoost estimator, .json: native XGBoost Booster,
+    # .npz: compiled model or lookup table (see save_native and build_lut.py).
+    # Linear models become a single dot product with the input normalization folded in, tree
+    # models are compiled to arrays (see tree_compiler) for batches of up to
+    # compiled_max_batch rows (default: from the metadata), unless compile is False
+    if os.path.splitext(model_path)[-1] == ".npz":
+        # Already compiled, with its input normalization
+        return _load_npz(model_path)
+    model = _load_file(model_path)
+    metadata = load_metadata(model_path)
+    scale, offset = input_transform(metadata)
+    if compile:
+        linear = compile_linear(model, scale, offset)
+        if linear is not None:
+            return linear
+        compiled = compile_model(model)
+        if compiled is not None:
+            if compiled_max_batch is None:
+                compiled_max_batch = metadata["compiled_max_batch"]
+            model = CompiledSmallBatches(compiled, model, compiled_max_batch)
+    if np.any(scale != 1) or np.any(offset != 0):
+        return ScaledInput(model, scale, offset)
+    return model
+
+
+def _load_file(model_path):
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found: {model_path}")
+
+    file_ext = os.path.splitext(model_path)[-1]
+    # The ML libraries are only imported for the formats that need them, a lookup table
+    # runs with NumPy alone
+    if file_ext == ".pkl":
+        import joblib
+        return joblib.load(model_path)
+    elif file_ext == ".json":
+        import xgboost as xgb
+        model = xgb.Booster()
+        model.load_model(model_path)
+        return model
+    else:
+        raise ValueError(f"Formato de modelo não suportado: {file_ext}")
+
+
+def _load_npz(model_path):
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found: {model_path}")
+    with np.load(model_path, allow_pickle=False) as arrays:
+        kind = str(arrays["format"]) if "format" in arrays else None
+        if kind not in NATIVE_FORMATS:
+            raise ValueError(f"Formato de modelo não suportado: {model_path} ({kind})")
+        model = NATIVE_FORMATS[kind].from_arrays(arrays)
+        if "input_scale" in arrays:
+            model = ScaledInput(model, arrays["input_scale"], arrays["input_offset"])
+    return model
+
+
+def save_native(model, path):
+    # Saves a model returned by load_model as a .npz of plain arrays, loaded without pickle
+    # nor any ML library. Only compiled tree and linear models can be saved
+    arrays = {}
+    if isinstance(model, ScaledInput):
+        arrays.update(input_scale=model.scale, input_offset=model.offset)
+        model = model.model
+    if isinstance(model, CompiledSmallBatches):
+        model = model.compiled
+    if not isinstance(model, (CompiledTreeEnsemble, LinearPredictor)):
+        raise ValueError(f"No native format for {type(model).__name__} models")
+    arrays.update(model.arrays())
+    np.savez(path, **arrays)
+
+
+def predict_rows(model, features):
+    # One prediction per row of features, whatever the output shape of the model
+    if type(model).__module__.startswith("xgboost") and type(model).__name__ == "Booster":
+        import xgboost as xgb
+        prediction = model.predict(xgb.DMatrix(features))
+    else:
+        prediction = model.predict(features)
+    return np.asarray(prediction).reshape(len(features), -1)[:, 0]
@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+from model_loader import load_model, METADATA_SUFFIX
+from xapp_logging import get_logger
+
+log = get_logger("model_registry")
+
+MODEL_EXTENSIONS = (".pkl", ".json", ".npz")
+LUT_SUFFIX = ".lut.npz"
+
+
+def model_name(model_path):
+    return os.path.splitext(os.path.basename(model_path))[0]
+
+
+def preferred_path(model_path, compile=True):
+    # A model exported next to its .pkl/.json file (see export_model.py) is the same model,
+    # compiled, and loads faster: it is used instead, unless compilation is disabled
+    native = os.path.splitext(model_path)[0] + ".npz"
+    if compile and model_path != native and os.path.exists(native):
+        return native
+    return model_path
+
+
+class ModelRegistry:
+    """
+    Every model of a directory, loaded once at startup, with one of them active.
+
+    The active model is kept as a single (name, model) tuple, so a switch is atomic for
+    readers: a batch that already read `active` finishes with the model it started with.
+    """
+
+    def __init__(self, models_dir, active_path, compile=True):
+        self.models_dir = models_dir
+        self.compile = compile
+        self.models = {}
+        self.paths = {}
+        self._lock = threading.Lock()
+
+        # A lookup table runs with NumPy alone, so with one selected the other models of the
+        # directory, and the ML libraries they need, are not loaded
+        files = sorted(os.listdir(models_dir)) if os.path.isdir(models_dir) and not active_path.endswith(LUT_SUFFIX) else []
+        paths = {}
+        for file in files:
+            if os.path.splitext(file)[-1] not in MODEL_EXTENSIONS or file.endswith(METADATA_SUFFIX):
+                continue
+            path = preferred_path(os.path.join(models_dir, file), compile)
+            paths.setdefault(model_name(path), path)
+        for path in paths.values():
+            try:
+                self._add(path)
+            except Exception as e:
+                log.error(f"Error loading model {path}: {e}")
+
+        # The selected model may live outside the directory
+        name = model_name(active_path)
+        if name not in self.models:
+            self._add(preferred_path(active_path, compile))
+        self.active = (name, self.models[name])
+
+    def _add(self, path):
+        name = model_name(path)
+        start = time.perf_counter()
+        self.models[name] = load_model(path, self.compile)
+        self.paths[name] = path
+        log.info(f"Model loaded successfully from {path} in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def names(self):
+        return list(self.models)
+
+    @property
+    def active_name(self):
+        return self.active[0]
+
+    @property
+    def active_path(self):
+        return self.paths[self.active[0]]
+
+    def activate(self, name):
+        with self._lock:
+            if name not in self.models:
+                raise KeyError(name)
+            self.active = (name, self.models[name])
+        return self.active
@@ -0,0 +1,150 @@
+import collections
+import threading
+import time
+import numpy as np
+from metrics_window import MetricsWindow
+
+
+class Scores(collections.namedtuple("Scores", "model values shadow", defaults=(None,))):
+    """
+    Predictions for a batch of rows, tagged with the name of the model that produced them,
+    and optionally the pending predictions of the shadow models for the same rows (see
+    shadow_scoring.ShadowBatch).
+    """
+
+    def rows(self, start, stop):
+        shadow = self.shadow.rows(start, stop) if self.shadow is not None else None
+        return Scores(self.model, self.values[start:stop], shadow)
+
+
+class NodeState:
+    """
+    Window and feature state of a single E2 node.
+    """
+
+    def __init__(self, node_id, buffer_size, report_period=1.0):
+        self.node_id = node_id
+        # Samples are kept for buffer_size + 1 seconds, the window is ready once it spans buffer_size
+        self.buffer_array = MetricsWindow(3, buffer_size + 1, report_period=report_period)
+        self.buffer_ready = False
+        self.features = None
+        # Per-UE windows for report styles 3, 4 and 5
+        self.ue_buffers = {}
+
+
+def score_entries(predict, entries):
+    """
+    Scores the (node_id, features, done) entries of a batch with a single predict call, which
+    returns Scores, and hands each entry the Scores of its own rows, or None when it had no
+    rows to score.
+    """
+
+    rows = [features for _, features, _ in entries if features is not None]
+    scores = predict(np.vstack(rows)) if rows else None
+
+    offset = 0
+    for _, features, done in entries:
+        if features is None:
+            done(None)
+        else:
+            done(scores.rows(offset, offset + len(features)))
+            offset += len(features)
+
+
+class PeriodBatcher:
+    """
+    Collects the feature rows of the E2 nodes that report in the same period and hands them
+    to `dispatch` as one batch of (node_id, features, done) entries.
+
+    A batch is dispatched as soon as every node has submitted, when a node submits a second
+    time (its next period started before some other node reported), or `deadline` seconds
+    after its first entry, so the rows of the other nodes are still written when a node stops
+    reporting. `done` receives the predictions for the rows of its entry, or None when it had
+    no rows to score.
+
+    Deadlines are kept by a single flush thread. A complete batch is swapped out under the
+    lock and queued, and `dispatch` runs after the lock is released, so submit() never waits
+    for the scoring of a batch it did not complete. Queued batches are dispatched one at a
+    time by whichever thread gets there first, in the order they were formed.
+    """
+
+    def __init__(self, dispatch, n_nodes=1, deadline=None):
+        self.dispatch = dispatch
+        self.n_nodes = n_nodes
+        self.deadline = deadline
+        self._pending = {}
+        self._expires = None
+        self._ready = collections.deque()
+        self._cond = threading.Condition()
+        self._dispatching = threading.Lock()
+        self._closed = False
+        self._thread = None
+        if deadline:
+            self._thread = threading.Thread(target=self._run, name="period-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, node_id, features, done):
+        with self._cond:
+            if node_id in self._pending:
+                self._swap()
+            self._pending[node_id] = (node_id, features, done)
+            if len(self._pending) >= self.n_nodes:
+                self._swap()
+            elif len(self._pending) == 1 and self._thread is not None:
+                self._expires = time.monotonic() + self.deadline
+                self._cond.notify()
+        self._drain(blocking=False)
+
+    def flush(self):
+        # Dispatches the pending entries, and returns once every queued batch is dispatched
+        with self._cond:
+            self._swap()
+        self._drain(blocking=True)
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    if self._expires is None:
+                        self._cond.wait()
+                        continue
+                    remaining = self._expires - time.monotonic()
+                    if remaining <= 0:
+                        self._swap()
+                        break
+                    self._cond.wait(remaining)
+            self._drain(blocking=False)
+
+    def _swap(self):
+        # Under the lock: moves the pending entries to the queue of batches to dispatch
+        self._expires = None
+        pending, self._pending = self._pending, {}
+        if pending:
+            self._ready.append(list(pending.values()))
+
+    def _drain(self, blocking):
+        # A thread that finds another one dispatching leaves its batch to it, unless blocking
+        while self._dispatching.acquire(blocking=blocking):
+            try:
+                while True:
+                    with self._cond:
+                        if not self._ready:
+                            break
+                        batch = self._ready.popleft()
+                    self.dispatch(batch)
+            finally:
+                self._dispatching.release()
+            # A batch queued while the lock was being released would wait for the next one
+            with self._cond:
+                if not self._ready:
+                    return
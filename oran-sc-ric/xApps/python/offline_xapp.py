@@ -0,0 +1,29 @@
+import ricxappframe.xapp_rest as ricrest
+from lib.xAppBase import xAppBase
+
+
+def _offline_init(self, config=None, http_server_port=8090, rmr_port=4560, *args, **kwargs):
+    # What the xApps use of xAppBase outside of subscriptions: the E2SM codecs and the HTTP
+    # server their endpoints are registered on. No RMR port is opened
+    from lib.e2sm_kpm_module import e2sm_kpm_module
+    from lib.e2sm_rc_module import e2sm_rc_module
+    self.running = True
+    self.e2sm_kpm = e2sm_kpm_module(self)
+    self.e2sm_rc = e2sm_rc_module(self)
+    self.server = ricrest.ThreadedHTTPServer("0.0.0.0", http_server_port)
+    self.server.start()
+
+
+def create_offline(xapp_class, *args, **kwargs):
+    """
+    Creates an xApp without the RIC: xAppBase is initialized without RMR, so the xApp can
+    only be driven by calling its subscription callback directly (replay, load tests).
+    Subscribing or sending E2 messages is not possible.
+    """
+
+    original = xAppBase.__init__
+    xAppBase.__init__ = _offline_init
+    try:
+        return xapp_class(*args, **kwargs)
+    finally:
+        xAppBase.__init__ = original
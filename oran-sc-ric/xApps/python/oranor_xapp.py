@@ -1,148 +1,369 @@
 #!/usr/bin/env python3
 
+# Startup stages are timed from here, imports included
+from startup_timer import StartupTimer
+startup = StartupTimer()
+
 import argparse
+import logging
 import signal
 import numpy as np
 import os
-import csv
 import time
-import pickle
-import joblib
-import xgboost as xgb 
 from lib.xAppBase import xAppBase
-from sklearn.preprocessing import MinMaxScaler
+from metrics_window import MetricsWindow
+from metrics_sink import CsvRowWriter, MetricsSink
+from columnar_store import NpyColumnarWriter, ArrowColumnarWriter, arrow_available
+from node_shards import NodeState, PeriodBatcher, Scores, score_entries
+from inference_pool import InferencePool, ProcessPredictor
+from shadow_scoring import ShadowScorer
+from prediction_cache import PredictionCache
+from model_loader import predict_rows
+from model_registry import ModelRegistry
+from power_rollups import RollupStore
+from xapp_metrics import CallbackMetric, Counter, Histogram, MetricsRegistry
+from http_endpoints import add_endpoint, json_body, query_params
+from sampling_profiler import enable_profiling
+from indication_recorder import IndicationRecorder
+from xapp_logging import add_logging_args, format_kpm_indication, get_logger, setup_logging_from_args
+startup.mark("imports")
+
+log = get_logger("oranor")
+
 
 class MyXapp(xAppBase):
-    def __init__(self, config, http_server_port, rmr_port, model_path):
+    def __init__(self, config, http_server_port, rmr_port, model_path, buffer_size=60, csv_queue_size=10000, csv_flush_rows=100, csv_flush_interval=1.0, output_format="csv", rotate_mb=64, rotate_seconds=3600, inference_workers=0, inference_mode="thread", inference_queue=64, overload_policy="drop_oldest", models_dir=None, shadow=False, shadow_queue=4, compile_models=True, cache_size=0, cache_quantum=(0.01, 0.5, 0.25), rollup_max_gap=10.0, rollup_max_ues=64, batch_deadline=1.0, recorder=None):
         super(MyXapp, self).__init__(config, http_server_port, rmr_port)
+        startup.mark("framework init")
         model_name = os.path.basename(model_path).replace(".pkl", "")
         self.csv_dir = "./Metrics"  
         self.time_init = time.strftime("%d%m%Y-%H%M%S")
         self.csv_file = f'{model_name}_metrics_{self.time_init}.csv'
         self.written_header = False
+        self.csv_queue_size = csv_queue_size
+        self.csv_flush_rows = csv_flush_rows
+        self.csv_flush_interval = csv_flush_interval
+        self.output_format = output_format
+        self.rotate_bytes = int(rotate_mb * 1024 * 1024)
+        self.rotate_seconds = rotate_seconds
         self._initialize_csv()
 
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model file not found: {model_path}")
+        # Every model of the models directory is loaded once, the selected one is active and
+        # can be switched over HTTP without losing the feature windows. Tree models are
+        # compiled to arrays, which predicts the same values with less per-call overhead
         try:
-            file_ext = os.path.splitext(model_path)[-1] 
-
-            if file_ext == ".pkl":
-                self.model = joblib.load(model_path)
-            elif file_ext == ".json":
-                self.model = xgb.Booster()
-                self.model.load_model(model_path)
-            else:
-                raise ValueError(f"Formato de modelo não suportado: {file_ext}")
-
-            print(f"Model loaded successfully from {model_path}")
-
+            self.registry = ModelRegistry(models_dir or os.path.dirname(model_path), model_path, compile_models)
         except Exception as e:
-            print(f"Error loading model: {e}")
+            log.error(f"Error loading model: {e}")
             raise
+        startup.mark("model load")
+        add_endpoint(self, "GET", "models", "/ric/v1/models", self._models_handler)
+        add_endpoint(self, "POST", "activeModel", "/ric/v1/active_model", self._active_model_handler)
+
+        # Window and feature state is kept per E2 node, the model is shared by all of them.
+        # The windows are sized from the period the nodes are subscribed with
+        self.buffer_size = buffer_size
+        self.report_period = 1000
+        self.nodes = {}
+
+        # In shadow mode every other loaded model is scored on the same features as the active
+        # one, off the primary path, and the predictions of all models go to their own file
+        self.shadow_scorer = None
+        self.shadow_sink = None
+        if shadow:
+            self.shadow_scorer = ShadowScorer(self.registry, max_pending=shadow_queue)
+            self.shadow_sink = self._open_sink(f'{model_name}_shadow_{self.time_init}.csv')
+
+        # Optional LRU cache of the active model predictions, keyed on the quantized features
+        self.prediction_cache = PredictionCache(cache_size, cache_quantum) if cache_size > 0 else None
+        add_endpoint(self, "GET", "predictionCache", "/ric/v1/prediction_cache", self._prediction_cache_handler)
+
+        # Power and integrated energy history per node and per UE, in fixed-size tiers
+        self.rollups = RollupStore(max_gap=rollup_max_gap, max_ue_series=rollup_max_ues)
+        add_endpoint(self, "GET", "energy", "/ric/v1/energy", self._energy_handler)
+
+        # With inference workers, batches are scored off the RMR receive thread
+        self.inference_pool = None
+        self.process_predictor = None
+        if inference_workers > 0:
+            if inference_mode == "process":
+                self.process_predictor = ProcessPredictor(inference_workers, self.registry.active_path, compile_models)
+            self.inference_pool = InferencePool(self.energy_predictor, inference_workers, inference_queue, overload_policy)
+            self.batcher = PeriodBatcher(self.inference_pool.submit, deadline=batch_deadline)
+        else:
+            self.batcher = PeriodBatcher(lambda entries: score_entries(self.energy_predictor, entries), deadline=batch_deadline)
+
+        self._initialize_metrics()
+        add_endpoint(self, "GET", "metrics", "/metrics", self._metrics_handler)
+
+        # Raw indications are written as received, for replay_indications.py
+        self.recorder = recorder
+        # Time of arrival of the indications, a replay sets it to the recorded one
+        self.clock = time.time
+
+    def _initialize_metrics(self):
+        # Prometheus metrics of the hot path, scraped from /metrics on the HTTP server port.
+        # Stage latencies are measured with perf_counter, the other values are read on scrape
+        self.metrics = MetricsRegistry()
+        self.stage_latency = self.metrics.add(Histogram("oranor_stage_latency_seconds", "Latency of each stage of the indication callback", "stage"))
+        self.indications = self.metrics.add(Counter("oranor_indications_total", "RIC indications received", "e2_agent_id"))
+        self.inference_batches = self.metrics.add(Counter("oranor_inference_batches_total", "Batches scored by the active model"))
+        self.inference_rows = self.metrics.add(Counter("oranor_inference_rows_total", "Feature rows scored by the active model"))
+        self.metrics.add(CallbackMetric("oranor_csv_queue_depth", "Rows waiting for the metrics writer", "gauge", self.sink.qsize))
+        self.metrics.add(CallbackMetric("oranor_csv_rows_dropped_total", "Rows dropped because the metrics writer queue was full", "counter", lambda: self.sink.dropped))
+        pool = lambda key: (lambda: self.inference_pool.stats()[key] if self.inference_pool is not None else None)
+        self.metrics.add(CallbackMetric("oranor_inference_queue_depth", "Batches waiting for an inference worker", "gauge", pool("queue_depth")))
+        self.metrics.add(CallbackMetric("oranor_inference_in_flight", "Batches being scored by inference workers", "gauge", pool("in_flight")))
+        self.metrics.add(CallbackMetric("oranor_inference_dropped_total", "Feature rows dropped by the overload policy", "counter", pool("dropped")))
+        self.metrics.add(CallbackMetric("oranor_inference_coalesced_total", "Feature rows replaced by a newer window of their node", "counter", pool("coalesced")))
+        self.metrics.add(CallbackMetric("oranor_inference_errors_total", "Feature rows whose inference failed", "counter", pool("errors")))
+        self.metrics.add(CallbackMetric("oranor_inference_lost_total", "Feature rows whose inference never completed, written without a prediction", "counter", pool("lost")))
+        self.metrics.add(CallbackMetric("oranor_shadow_dropped_total", "Feature rows whose shadow predictions were dropped because the shadow models fell behind", "counter", lambda: self.shadow_scorer.dropped if self.shadow_scorer is not None else None))
+        cache = lambda key: (lambda: self.prediction_cache.stats()[key] if self.prediction_cache is not None else None)
+        self.metrics.add(CallbackMetric("oranor_prediction_cache_hits_total", "Rows answered by the prediction cache", "counter", cache("hits")))
+        self.metrics.add(CallbackMetric("oranor_prediction_cache_misses_total", "Rows scored by the model after a cache miss", "counter", cache("misses")))
+        self.metrics.add(CallbackMetric("oranor_lut_clipped_total", "Feature rows outside the bounds of the active lookup table", "counter", lambda: getattr(self.registry.active[1], "clipped", None)))
+        self.metrics.add(CallbackMetric("oranor_active_model_info", "Active model, by name", "gauge", lambda: {self.registry.active_name: 1}, "model"))
+
+    def _metrics_handler(self, path, data):
+        return 200, self.metrics.render(), MetricsRegistry.CONTENT_TYPE
 
-        self.buffer_array = []
-        self.buffer_ready = False
-    
     def _initialize_csv(self):
         # Verifica se o diretório existe, se não, cria
         if not os.path.exists(self.csv_dir):
             os.makedirs(self.csv_dir)
             
         self.csv_path = os.path.join(self.csv_dir, self.csv_file)
-        
-        # Inicializa o arquivo CSV se não existir
+        self.sink = self._open_sink(self.csv_file)
+
+    def _open_sink(self, csv_file):
+        # Inicializa o arquivo CSV, que fica aberto até o xApp terminar.
+        # Nos formatos colunares, os segmentos ficam em Metrics/ com o nome do CSV como prefixo
         try:
-            with open(self.csv_path, mode='w', newline='') as file:
-                pass
+            prefix = os.path.splitext(csv_file)[0]
+            if self.output_format == "csv":
+                writer = CsvRowWriter(os.path.join(self.csv_dir, csv_file))
+            elif self.output_format == "npy":
+                writer = NpyColumnarWriter(self.csv_dir, prefix, self.rotate_bytes, self.rotate_seconds)
+            elif self.output_format == "arrow":
+                writer = ArrowColumnarWriter(self.csv_dir, prefix, self.rotate_bytes, self.rotate_seconds)
+            else:
+                raise ValueError(f"Unsupported output format: {self.output_format}")
         except Exception as e:
-            print(f"Error initializing CSV file: {e}")
-        
-    def my_subscription_callback(self, e2_agent_id, subscription_id, indication_hdr, indication_msg, kpm_report_style, ue_id):
-        if kpm_report_style == 2:
-            print("\nRIC Indication Received from {} for Subscription ID: {}, KPM Report Style: {}, UE ID: {}".format(e2_agent_id, subscription_id, kpm_report_style, ue_id))
-        else:
-            print("\nRIC Indication Received from {} for Subscription ID: {}, KPM Report Style: {}".format(e2_agent_id, subscription_id, kpm_report_style))
+            log.error(f"Error initializing CSV file: {e}")
+            raise
+        return MetricsSink(writer, max_queue=self.csv_queue_size, flush_rows=self.csv_flush_rows, flush_interval=self.csv_flush_interval)
 
+    def _models_handler(self, path, data):
+        return 200, {"active": self.registry.active_name, "models": self.registry.names()}
+
+    def _active_model_handler(self, path, data):
+        # Body: {"model": "<model name without extension>"}
+        name = json_body(data).get("model")
+        try:
+            self.registry.activate(name)
+        except KeyError:
+            return 404, {"error": f"Unknown model: {name}", "models": self.registry.names()}
+        log.info(f"Active model switched to {name}")
+        return 200, {"active": name}
+
+    def _prediction_cache_handler(self, path, data):
+        if self.prediction_cache is None:
+            return 404, {"error": "Prediction cache is disabled, see --cache_size"}
+        return 200, self.prediction_cache.stats()
+
+    def _energy_handler(self, path, data):
+        # ?node=<e2 agent>&ue=<ue id> filters the summary, adding &resolution=<s> (and
+        # optionally &start=<ts>&end=<ts>) returns the buckets of that tier for one series
+        query = query_params(path)
+        node_id, ue_id = query.get("node"), query.get("ue")
+        if "resolution" not in query:
+            return 200, self.rollups.summary(node_id, ue_id)
+        start = float(query["start"]) if "start" in query else None
+        end = float(query["end"]) if "end" in query else None
+        try:
+            return 200, self.rollups.series(node_id, ue_id, int(query["resolution"]), start, end)
+        except KeyError as e:
+            return 404, {"error": f"Unknown series or resolution: {e}"}
+
+    def signal_handler(self, sig, frame):
+        # Drain pending predictions and rows before the framework unsubscribes and exits
+        self.close()
+        super(MyXapp, self).signal_handler(sig, frame)
+
+    def close(self):
+        # Entries of nodes still waiting for the others are scored before the pool and sink stop
+        self.batcher.close()
+        if self.recorder is not None:
+            self.recorder.close()
+            log.info(f"{self.recorder.count} indications recorded to {self.recorder.path}")
+        if self.inference_pool is not None:
+            self.inference_pool.close()
+            log.info("Inference stats: {}".format(self.inference_pool.stats()))
+        if self.process_predictor is not None:
+            self.process_predictor.close()
+        if self.shadow_scorer is not None:
+            # Waits for the shadow batches still queued, at most --shadow_queue, which write their rows when done
+            self.shadow_scorer.close()
+            self.shadow_sink.close()
+        if self.prediction_cache is not None:
+            log.info("Prediction cache stats: {}".format(self.prediction_cache.stats()))
+        self.sink.close()
+
+    def node_state(self, e2_agent_id):
+        node = self.nodes.get(e2_agent_id)
+        if node is None:
+            node = self.nodes[e2_agent_id] = NodeState(e2_agent_id, self.buffer_size, self.report_period / 1000)
+        return node
+
+    def my_subscription_callback(self, e2_agent_id, subscription_id, indication_hdr, indication_msg, kpm_report_style, ue_id):
+        if self.recorder is not None:
+            self.recorder.record(e2_agent_id, subscription_id, indication_hdr, indication_msg)
+        timer = self.stage_latency.timer()
+        self.indications.inc(1, e2_agent_id)
         indication_hdr = self.e2sm_kpm.extract_hdr_info(indication_hdr)
+        timer.lap("extract_hdr_info")
         meas_data = self.e2sm_kpm.extract_meas_data(indication_msg)
+        timer.lap("extract_meas_data")
+        node = self.node_state(e2_agent_id)
         
         # Creation of necessary variables
-        timestamp = time.time()
-        name_metrics = list(meas_data["measData"].keys())
-        metric_values = list(meas_data["measData"].values())
-        self.get_data(meas_data) 
+        timestamp = self.clock()
+        if kpm_report_style in [1,2]:
+            metric_values = list(meas_data["measData"].values())
+            self.get_data(node, meas_data) 
+            features = node.features if node.buffer_ready else None
+            timer.lap("get_data")
+        else:
+            ue_ids, features = self.get_ue_data(node, meas_data)
+            timer.lap("get_ue_data")
         
-        print("E2SM_KPM RIC Indication Content:")
-        print("-ColletStartTime: ", indication_hdr['colletStartTime'])
-        print("-Measurements Data:")
+        # One message per indication, only formatted when it is logged
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(format_kpm_indication(e2_agent_id, subscription_id, kpm_report_style, ue_id, indication_hdr, meas_data))
+        timer.lap("log")
 
-        granulPeriod = meas_data.get("granulPeriod", None)
-        if granulPeriod is not None:
-            print("-granulPeriod: {}".format(granulPeriod))
+        # CSV rows are only enqueued here, the sink thread writes them
+        if not self.written_header:
+            self.write_header(kpm_report_style, meas_data)
 
+        # Rows are written once the prediction for this node's period is available
         if kpm_report_style in [1,2]:
-            for metric_name, value in meas_data["measData"].items():
-                print("--Metric: {}, Value: {}".format(metric_name, value))
-
+            write = lambda predictions: self.write_rows(timestamp, e2_agent_id, subscription_id, metric_values, features, predictions)
         else:
-            for ue_id, ue_meas_data in meas_data["ueMeasData"].items():
-                print("--UE_id: {}".format(ue_id))
-                granulPeriod = ue_meas_data.get("granulPeriod", None)
-                if granulPeriod is not None:
-                    print("---granulPeriod: {}".format(granulPeriod))
-
-                for metric_name, value in ue_meas_data["measData"].items():
-                    print("---Metric: {}, Value: {}".format(metric_name, value))
-        
-        if self.buffer_ready == True:
-            prediction = self.energy_predictor(self.features)
-        
-        # CSV writer
-        with open(self.csv_path, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            
-            if not self.written_header:
-                header = ["Timestamp", "E2 Agent ID", "Subscription ID"] + name_metrics + ["PowerPrediction"] + ["Airtime_Norm"] + ["SNR_Norm"] + ["Mcs_Norm"] #+ ["Metrics Array"] 
-                writer.writerow(header)
-                self.written_header = True
-            
-            flat_metric_values = [value[0] if isinstance(value, list) else value for value in metric_values] 
-            
-            if self.buffer_ready == True:  
-                #flat_prediction = [prediction[0][0] if isinstance(prediction[0], list) else prediction[0]]
-                flat_prediction = prediction[0][0] if isinstance(prediction[0], (list, np.ndarray)) else prediction[0]
-                #writer.writerow([timestamp, e2_agent_id, subscription_id]+ flat_metric_values + list(flat_prediction[0]) ) #+ [self.metric_array] + [self.features] )
-                writer.writerow([timestamp, e2_agent_id, subscription_id]+ flat_metric_values + [flat_prediction] + [self.airtime_scl] + [self.snr_scl]  + [self.mcs_ul_scl]) #+ [self.metric_array] + [self.features] )
-            else:     
-                writer.writerow([timestamp, e2_agent_id, subscription_id]+ flat_metric_values + ["NA"] ) #+ [self.metric_array])            
-    
-    def metrics_buffer(self, metric_array):
-        ts = time.time()
-        self.buffer_array.append((metric_array,ts))
-        
-        last_timestamp = self.buffer_array[-1][1]
-        self.buffer_array = [
-            item for item in self.buffer_array
-            if (last_timestamp - item[1]) <= buffer + 1
-        ]
-        ##print(f"\n\n BUFFER:{self.buffer_array}\n\n")
-        if len(self.buffer_array)> 1:    
-            time_diff  = (self.buffer_array[-1][1] - self.buffer_array[0][1])
-
-            if (time_diff) >= buffer:
-                # print(f"\n\n BUFFER:{self.buffer_array}\n\n")
-                self.normalize_features(self.buffer_array)           
-                self.buffer_ready = True
+            write = lambda predictions: self.write_ue_rows(timestamp, e2_agent_id, subscription_id, meas_data, ue_ids, features, predictions)
+        done = lambda predictions: self.finish_indication(timer, write, predictions)
+        self.batcher.submit(e2_agent_id, features, done)
+        # Includes the inference and the write when they run on this thread
+        timer.lap("submit")
+        timer.total("callback")
+
+    def finish_indication(self, timer, write, predictions):
+        start = time.perf_counter()
+        write(predictions)
+        end = time.perf_counter()
+        self.stage_latency.observe(end - start, "csv_write")
+        # From the indication to its rows, inference and waiting for other nodes included
+        self.stage_latency.observe(end - timer.start, "end_to_end")
+
+    def write_header(self, kpm_report_style, meas_data):
+        if kpm_report_style in [1,2]:
+            name_metrics = list(meas_data["measData"].keys())
+            header = ["Timestamp", "E2 Agent ID", "Subscription ID"] + name_metrics + ["PowerPrediction"] + ["Airtime_Norm"] + ["SNR_Norm"] + ["Mcs_Norm"] + ["Model"]
+            keys = ["Timestamp", "E2 Agent ID", "Subscription ID"]
+        else:
+            ue_meas = meas_data["ueMeasData"]
+            if not ue_meas:
+                return
+            name_metrics = list(next(iter(ue_meas.values()))["measData"].keys())
+            header = ["Timestamp", "E2 Agent ID", "Subscription ID", "UE ID"] + name_metrics + ["PowerPrediction"] + ["Airtime_Norm"] + ["SNR_Norm"] + ["Mcs_Norm"] + ["Model"]
+            keys = ["Timestamp", "E2 Agent ID", "Subscription ID", "UE ID"]
+        self.sink.write_header(header)
+        if self.shadow_sink is not None:
+            # One prediction column per loaded model, whichever of them is active
+            self.shadow_sink.write_header(keys + ["Pred_" + name for name in self.registry.names()])
+        self.written_header = True
+
+    def write_shadow_rows(self, keys, scores, shadow):
+        # Called once every shadow model has scored the batch, possibly after the primary rows
+        # were written. Each row carries the timestamp and ids of the primary row it belongs to
+        columns = [scores.values if name == scores.model else shadow.get(name, np.full(len(scores.values), np.nan))
+                   for name in self.registry.names()]
+        for i, row in enumerate(keys):
+            self.shadow_sink.write(row + [column[i] for column in columns])
+
+    def write_rows(self, timestamp, e2_agent_id, subscription_id, metric_values, features, scores):
+        flat_metric_values = [value[0] if isinstance(value, list) else value for value in metric_values] 
+
+        if scores is not None:  
+            prediction = scores.values[0]
+            energy = self.rollups.add(e2_agent_id, None, timestamp, prediction)
+            log.info(f"Estimated Power: {prediction.item():.4f} W  Estimated Energy : {energy:.4f} Wh")
+            self.sink.write([timestamp, e2_agent_id, subscription_id]+ flat_metric_values + [prediction] + list(features[0]) + [scores.model])
+            if scores.shadow is not None:
+                scores.shadow.when_done(lambda shadow: self.write_shadow_rows([[timestamp, e2_agent_id, subscription_id]], scores, shadow))
+        else:     
+            self.sink.write([timestamp, e2_agent_id, subscription_id]+ flat_metric_values + ["NA"] )
+
+    def write_ue_rows(self, timestamp, e2_agent_id, subscription_id, meas_data, ue_ids, ue_features, ue_scores):
+        # One row per UE, UEs without a full window yet get "NA" as prediction, as do all of
+        # them when the batch was dropped or its inference failed
+        ready = {ue_id: i for i, ue_id in enumerate(ue_ids)} if ue_scores is not None else {}
+        for ue_id, ue_meas_data in meas_data["ueMeasData"].items():
+            flat_metric_values = [value[0] if isinstance(value, list) else value for value in ue_meas_data["measData"].values()]
+            row = [timestamp, e2_agent_id, subscription_id, ue_id] + flat_metric_values
+            i = ready.get(ue_id)
+            if i is not None:
+                prediction = ue_scores.values[i]
+                energy = self.rollups.add(e2_agent_id, ue_id, timestamp, prediction)
+                log.info(f"UE {ue_id} Estimated Power: {prediction.item():.4f} W  Estimated Energy : {energy:.4f} Wh")
+                self.sink.write(row + [prediction] + list(ue_features[i]) + [ue_scores.model])
+            else:
+                self.sink.write(row + ["NA"])
+        if ue_scores is not None and ue_scores.shadow is not None:
+            keys = [[timestamp, e2_agent_id, subscription_id, ue_id] for ue_id in ue_ids]
+            ue_scores.shadow.when_done(lambda shadow: self.write_shadow_rows(keys, ue_scores, shadow))
     
-        #
-
-            
-    def get_data(self, meas_data):
-        mcs_ul = meas_data["measData"].get("McsUl")
-        snr = meas_data["measData"].get("SNR")
-        prbtotul = meas_data["measData"].get("RRU.PrbTotUl") # This measurement provides the total usage (in percentage) of physical resource blocks (PRBs)
-        prbmeanul = meas_data["measData"].get("RRU.PrbUsedUl")
+    def metrics_buffer(self, node, metric_array):
+        ts = self.clock()
+        node.buffer_array.push(ts, metric_array)
+
+        if len(node.buffer_array) > 1:
+            if node.buffer_array.span() >= self.buffer_size:
+                start = time.perf_counter()
+                self.normalize_features(node, node.buffer_array.mean())
+                self.stage_latency.observe(time.perf_counter() - start, "normalize_features")
+                node.buffer_ready = True
+
+    def get_ue_data(self, node, meas_data):
+        # Each UE has its own window, the UEs whose window is full are returned with their
+        # (n_ue x 3) feature matrix so the model is evaluated once for all of them
+        ts = self.clock()
+        ready = []
+        for ue_id, ue_meas_data in meas_data["ueMeasData"].items():
+            metric_array = self.extract_metric_array(ue_meas_data["measData"])
+            if None in metric_array:
+                continue
+            window = node.ue_buffers.get(ue_id)
+            if window is None:
+                window = node.ue_buffers[ue_id] = MetricsWindow(3, self.buffer_size + 1, report_period=self.report_period / 1000)
+            window.push(ts, metric_array)
+            if len(window) > 1 and window.span() >= self.buffer_size:
+                ready.append(ue_id)
+
+        # Forget UEs that stopped reporting
+        for ue_id in [ue_id for ue_id, window in node.ue_buffers.items() if ts - window.newest_ts > window.horizon]:
+            del node.ue_buffers[ue_id]
+
+        if not ready:
+            return ready, None
+        means = np.array([node.ue_buffers[ue_id].mean() for ue_id in ready])
+        return ready, self.feature_matrix(means)
+
+    def extract_metric_array(self, meas):
+        mcs_ul = meas.get("McsUl")
+        snr = meas.get("SNR")
+        prbtotul = meas.get("RRU.PrbTotUl") # This measurement provides the total usage (in percentage) of physical resource blocks (PRBs)
 
         # conversion to expected format 
         if isinstance(mcs_ul, list):
@@ -151,84 +372,90 @@ class MyXapp(xAppBase):
             snr = snr[0]
         if isinstance(prbtotul, list):
             prbtotul = prbtotul[0]
-        if isinstance(prbmeanul, list):
-            prbmeanul = prbmeanul[0]
-        
-        self.metric_array = [mcs_ul, snr, prbtotul]#
-        self.metrics_buffer(self.metric_array)
+        return [mcs_ul, snr, prbtotul]
 
+    def get_data(self, node, meas_data):
+        metric_array = self.extract_metric_array(meas_data["measData"])
+        self.metrics_buffer(node, metric_array)
 
-
-    def normalize_features(self, buffer_array):
-        # Extracting the means of columns
-        array = [items[0] for items in buffer_array]
-        buffer_array = np.array(array)
-        mean_mcs_ul = np.mean(buffer_array[:, 2])
-        mean_snr = np.mean(buffer_array[:, 1])
-        mean_prbtotul = np.mean(buffer_array[:, 0])
+    def feature_matrix(self, means):
+        # Rows of windowed column means -> rows of [airtime, snr, mcs_ul] model features.
+        # The features stay in their own units, a model trained on normalized features gets
+        # its min-max normalization from its metadata when loaded (see model_loader)
+        mean_mcs_ul = means[:, 2]
+        mean_snr = means[:, 1]
+        mean_prbtotul = means[:, 0]
 
         airtime = mean_prbtotul / 100
-        
-        airtime_ul_max = 1
-        airtime_ul_min = 0
-        mcs_ul_max = 28
-        mcs_ul_min = 0
-        snr_max = 65
-        snr_min = 0
-
-        # Metrics normalization        
-        mcs_ul_norm = (mean_mcs_ul - mcs_ul_min) / (mcs_ul_max - mcs_ul_min)
-        self.mcs_ul_scl = mcs_ul_norm*(mcs_ul_max - mcs_ul_min) + mcs_ul_min
-        snr_norm = (mean_snr - snr_min) / (snr_max - snr_min)
-        self.snr_scl = snr_norm*(snr_max - snr_min) + snr_min
-        airtime_norm = (airtime - airtime_ul_min) / (airtime_ul_max - airtime_ul_min)
-        self.airtime_scl = airtime_norm*(airtime_ul_max - airtime_ul_min) + airtime_ul_min
-        
+
         # Array construction
-        self.features = np.array([[self.airtime_scl,self.snr_scl,self.mcs_ul_scl]]) # 2 - 
-        # print(f"\n\n Features:{self.features}\n\n")
-        # print(type(self.features))
-        self.energy_predictor(self.features)
-        
+        return np.column_stack([airtime, mean_snr, mean_mcs_ul])
+
+    def normalize_features(self, node, means):
+        node.features = self.feature_matrix(means.reshape(1, -1))
     
     def energy_predictor(self, features): 
-        # Make power predictions based on provided features  
-        prediction = self.model.predict(self.features)
-        time_diff  = (self.buffer_array[-1][1] - self.buffer_array[0][1])
-        print(f"Estimated Power: {prediction[0].item():.4f} W  Estimated Energy : {prediction[0].item() * (1/3600):.4f} Wh")
-        # print(f"Power Estimated: {prediction[0].item()}W  Energy Estimated: {prediction[0].item() * (self.time_init - time.strftime("%d%m%Y-%H%M%S")) * (10**-3)}kW/h")
-        return prediction          
+        # Make power predictions based on provided features, one value per row.
+        # The active model is read once, so a switch never splits a batch
+        start = time.perf_counter()
+        name, model = self.registry.active
+
+        if self.process_predictor is not None:
+            predict = lambda rows: self.process_predictor.predict(self.registry.paths[name], rows)
+        else:
+            predict = lambda rows: predict_rows(model, rows)
+        if self.prediction_cache is not None:
+            values = self.prediction_cache.predict(name, predict, features)
+        else:
+            values = predict(features)
+        # Shadow models start once the primary prediction is done, so they do not compete with it
+        shadow = self.shadow_scorer.submit(features, name) if self.shadow_scorer is not None else None
+
+        self.stage_latency.observe(time.perf_counter() - start, "energy_predictor")
+        self.inference_batches.inc()
+        self.inference_rows.inc(len(features))
+        return Scores(name, values, shadow)
 
     # Mark the function as xApp start function using xAppBase.start_function decorator.
     # It is required to start the internal msg receive loop.
     @xAppBase.start_function
-    def start(self, e2_node_id, kpm_report_style, ue_ids, metric_names):
-        report_period = 1000
+    def start(self, e2_node_ids, kpm_report_style, ue_ids, metric_names):
+        # Indications of the nodes reporting in the same period are scored together
+        self.batcher.n_nodes = len(e2_node_ids)
+        startup.mark("xApp init")
+        for e2_node_id in e2_node_ids:
+            self.subscribe(e2_node_id, kpm_report_style, list(ue_ids), list(metric_names))
+        startup.mark("subscription")
+        log.info(startup.report())
+
+    def subscribe(self, e2_node_id, kpm_report_style, ue_ids, metric_names):
+        report_period = self.report_period
         granul_period = 1000
 
         # use always the same subscription callback, but bind kpm_report_style parameter
         subscription_callback = lambda agent, sub, hdr, msg: self.my_subscription_callback(agent, sub, hdr, msg, kpm_report_style, None)
 
         if (kpm_report_style == 1):
-            print("Subscribe to E2 node ID: {}, RAN func: e2sm_kpm, Report Style: {}, metrics: {}".format(e2_node_id, kpm_report_style, metric_names))
+            log.info("Subscribe to E2 node ID: {}, RAN func: e2sm_kpm, Report Style: {}, metrics: {}".format(e2_node_id, kpm_report_style, metric_names))
             self.e2sm_kpm.subscribe_report_service_style_1(e2_node_id, report_period, metric_names, granul_period, subscription_callback)
 
         elif (kpm_report_style == 2):
             # need to bind also UE_ID to callback as it is not present in the RIC indication in the case of E2SM KPM Report Style 2
             subscription_callback = lambda agent, sub, hdr, msg: self.my_subscription_callback(agent, sub, hdr, msg, kpm_report_style, ue_ids[0])
             
-            print("Subscribe to E2 node ID: {}, RAN func: e2sm_kpm, Report Style: {}, UE_id: {}, metrics: {}".format(e2_node_id, kpm_report_style, ue_ids[0], metric_names))
+            log.info("Subscribe to E2 node ID: {}, RAN func: e2sm_kpm, Report Style: {}, UE_id: {}, metrics: {}".format(e2_node_id, kpm_report_style, ue_ids[0], metric_names))
             self.e2sm_kpm.subscribe_report_service_style_2(e2_node_id, report_period, ue_ids[0], metric_names, granul_period, subscription_callback)
 
         elif (kpm_report_style == 3):
             if (len(metric_names) > 1):
                 metric_names = metric_names[0]
-                print("INFO: Currently only 1 metric can be requested in E2SM-KPM Report Style 3, selected metric: {}".format(metric_names))
+                log.info("Currently only 1 metric can be requested in E2SM-KPM Report Style 3, selected metric: {}".format(metric_names))
+                log.info("Per-UE power estimation needs McsUl, SNR and RRU.PrbTotUl, use Report Style 4 or 5 for it")
             # TODO: currently only dummy condition that is always satisfied, useful to get IDs of all connected UEs
             # example matching UE condition: ul-rSRP < 1000
             matchingConds = [{'matchingCondChoice': ('testCondInfo', {'testType': ('ul-rSRP', 'true'), 'testExpr': 'lessthan', 'testValue': ('valueInt', 1000)})}]
 
-            print("Subscribe to E2 node ID: {}, RAN func: e2sm_kpm, Report Style: {}, metrics: {}".format(e2_node_id, kpm_report_style, metric_names))
+            log.info("Subscribe to E2 node ID: {}, RAN func: e2sm_kpm, Report Style: {}, metrics: {}".format(e2_node_id, kpm_report_style, metric_names))
             self.e2sm_kpm.subscribe_report_service_style_3(e2_node_id, report_period, matchingConds, metric_names, granul_period, subscription_callback)
 
         elif (kpm_report_style == 4):
@@ -236,48 +463,86 @@ class MyXapp(xAppBase):
             # example matching UE condition: ul-rSRP < 1000
             matchingUeConds = [{'testCondInfo': {'testType': ('ul-rSRP', 'true'), 'testExpr': 'lessthan', 'testValue': ('valueInt', 1000)}}]
             
-            print("Subscribe to E2 node ID: {}, RAN func: e2sm_kpm, Report Style: {}, metrics: {}".format(e2_node_id, kpm_report_style, metric_names))
+            log.info("Subscribe to E2 node ID: {}, RAN func: e2sm_kpm, Report Style: {}, metrics: {}".format(e2_node_id, kpm_report_style, metric_names))
             self.e2sm_kpm.subscribe_report_service_style_4(e2_node_id, report_period, matchingUeConds, metric_names, granul_period, subscription_callback)
 
         elif (kpm_report_style == 5):
             if (len(ue_ids) < 2):
                 dummyUeId = ue_ids[0] + 1
                 ue_ids.append(dummyUeId)
-                print("INFO: Subscription for E2SM_KPM Report Service Style 5 requires at least two UE IDs -> add dummy UeID: {}".format(dummyUeId))
+                log.info("Subscription for E2SM_KPM Report Service Style 5 requires at least two UE IDs -> add dummy UeID: {}".format(dummyUeId))
 
-            print("Subscribe to E2 node ID: {}, RAN func: e2sm_kpm, Report Style: {}, UE_ids: {}, metrics: {}".format(e2_node_id, kpm_report_style, ue_ids, metric_names))
+            log.info("Subscribe to E2 node ID: {}, RAN func: e2sm_kpm, Report Style: {}, UE_ids: {}, metrics: {}".format(e2_node_id, kpm_report_style, ue_ids, metric_names))
             self.e2sm_kpm.subscribe_report_service_style_5(e2_node_id, report_period, ue_ids, metric_names, granul_period, subscription_callback)
 
         else:
-            print("INFO: Subscription for E2SM_KPM Report Service Style {} is not supported".format(kpm_report_style))
+            log.error("Subscription for E2SM_KPM Report Service Style {} is not supported".format(kpm_report_style))
             exit(1)
 
 
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='My example xApp')
+def add_arguments(parser):
+    # Command line of the xApp, shared with replay_indications.py and the load generator
     parser.add_argument("--config", type=str, default='', help="xApp config file path")
     parser.add_argument("--http_server_port", type=int, default=8092, help="HTTP server listen port")
     parser.add_argument("--rmr_port", type=int, default=4562, help="RMR port")
-    parser.add_argument("--e2_node_id", type=str, default='gnbd_001_001_00019b_0', help="E2 Node ID")
+    parser.add_argument("--e2_node_id", type=str, default='gnbd_001_001_00019b_0', help="E2 Node ID, or comma-separated list of E2 Node IDs")
     parser.add_argument("--ran_func_id", type=int, default=2, help="RAN function ID")
     parser.add_argument("--kpm_report_style", type=int, default=1, help="xApp config file path")
     parser.add_argument("--ue_ids", type=str, default='0', help="UE ID")
     parser.add_argument("--metrics", type=str, default='RRU.PrbAvailUl,RRU.PrbTotUl,McsUl,SNR', help="Metrics name as comma-separated string")
     parser.add_argument("--buffer_size", type=int, default='60', help="Defines the size buffer will have")
+    parser.add_argument("--csv_queue_size", type=int, default=10000, help="Maximum number of CSV rows waiting to be written")
+    parser.add_argument("--csv_flush_rows", type=int, default=100, help="Number of queued CSV rows that triggers a write")
+    parser.add_argument("--csv_flush_interval", type=float, default=1.0, help="Maximum time in seconds a CSV row waits before being written")
+    parser.add_argument("--output_format", type=str, default='csv', choices=['csv', 'npy', 'arrow'], help="Metrics output: CSV file, or rotated columnar segments (NumPy memmap or Arrow IPC)")
+    parser.add_argument("--rotate_mb", type=float, default=64, help="Size in MB at which a columnar output segment is rotated")
+    parser.add_argument("--rotate_seconds", type=int, default=3600, help="Age in seconds at which a columnar output segment is rotated")
+    parser.add_argument("--inference_workers", type=int, default=0, help="Number of inference workers, 0 runs the model on the RMR receive thread")
+    parser.add_argument("--inference_mode", type=str, default='thread', choices=['thread', 'process'], help="Run inference workers as threads or as processes with their own model copy")
+    parser.add_argument("--inference_queue", type=int, default=64, help="Maximum number of batches waiting for an inference worker")
+    parser.add_argument("--overload_policy", type=str, default='drop_oldest', choices=['drop_oldest', 'coalesce'], help="What to do when inference falls behind: drop the oldest batch, or keep only the latest window per node")
+    parser.add_argument("--models_dir", type=str, default='', help="Directory whose models are preloaded for switching over HTTP (default: directory of --model)")
+    parser.add_argument("--shadow", action='store_true', help="Score every loaded model on the same features as the active one, off the primary path, into a <model>_shadow_<time> file with one prediction column per model")
+    parser.add_argument("--shadow_queue", type=int, default=4, help="Maximum number of batches waiting for the shadow models, the oldest gets NaN shadow predictions when full")
+    parser.add_argument("--no_compile", action='store_true', help="Run tree and linear models with their own library instead of the compiled array form")
+    parser.add_argument("--cache_size", type=int, default=0, help="Number of predictions kept in an LRU cache keyed on the quantized features, 0 disables the cache")
+    parser.add_argument("--cache_quantum", type=str, default='0.01,0.5,0.25', help="Quantization step of airtime, SNR and MCS for the prediction cache, as comma-separated string")
+    parser.add_argument("--rollup_max_gap", type=float, default=10.0, help="Longest time in seconds between two predictions that is integrated into energy")
+    parser.add_argument("--rollup_max_ues", type=int, default=64, help="Number of UEs whose power and energy history is kept")
+    parser.add_argument("--batch_deadline", type=float, default=1.0, help="Time in seconds after which the nodes that reported in a period are scored without the missing ones, 0 waits for all of them")
+    parser.add_argument("--record", type=str, default='', help="Record the raw RIC indications received to this file, for replay_indications.py")
+    add_logging_args(parser)
     parser.add_argument("--model", type=str, default='/opt/xApps/models/decision_tree_12-02-2025_01-05-59_5.pkl', help="Select the model to use. (default path: /opt/xApps/models/<model_name>)")
 
+
+def check_arguments(parser, args):
+    # Options that cannot work in this environment end the program before the xApp starts
+    if args.output_format == "arrow" and not arrow_available():
+        parser.error("--output_format arrow requires pyarrow, install it (pip install pyarrow) or use --output_format npy")
+
+
+def xapp_arguments(args, recorder=None):
+    # Positional arguments of MyXapp for a parsed command line
+    return (args.config, args.http_server_port, args.rmr_port, args.model, args.buffer_size, args.csv_queue_size, args.csv_flush_rows, args.csv_flush_interval, args.output_format, args.rotate_mb, args.rotate_seconds, args.inference_workers, args.inference_mode, args.inference_queue, args.overload_policy, args.models_dir, args.shadow, args.shadow_queue, not args.no_compile, args.cache_size, list(map(float, args.cache_quantum.split(","))), args.rollup_max_gap, args.rollup_max_ues, args.batch_deadline, recorder)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='My example xApp')
+    add_arguments(parser)
+
     args = parser.parse_args()
+    check_arguments(parser, args)
+    setup_logging_from_args(args)
     config = args.config
-    e2_node_id = args.e2_node_id # TODO: get available E2 nodes from SubMgr, now the id has to be given.
+    e2_node_ids = args.e2_node_id.split(",") # TODO: get available E2 nodes from SubMgr, now the id has to be given.
     ran_func_id = args.ran_func_id # TODO: get available E2 nodes from SubMgr, now the id has to be given.
     ue_ids = list(map(int, args.ue_ids.split(","))) # Note: the UE id has to exist at E2 node!
     kpm_report_style = args.kpm_report_style
     metrics = args.metrics.split(",")
-    buffer = args.buffer_size
-    model_path= args.model
 
     # Create MyXapp.
-    myXapp = MyXapp(config, args.http_server_port, args.rmr_port, args.model)
+    recorder = IndicationRecorder(args.record, {"e2_node_ids": e2_node_ids, "kpm_report_style": kpm_report_style, "ue_ids": ue_ids, "metrics": metrics}) if args.record else None
+    myXapp = MyXapp(*xapp_arguments(args, recorder))
     myXapp.e2sm_kpm.set_ran_func_id(ran_func_id)
 
     # Connect exit signals.
@@ -285,6 +550,9 @@ if __name__ == '__main__':
     signal.signal(signal.SIGTERM, myXapp.signal_handler)
     signal.signal(signal.SIGINT, myXapp.signal_handler)
 
+    # Sampling profiler on demand: kill -USR1 <pid> or POST /ric/v1/profiler
+    enable_profiling(myXapp)
+
     # Start xApp.
-    myXapp.start(e2_node_id, kpm_report_style, ue_ids, metrics)
+    myXapp.start(e2_node_ids, kpm_report_style, ue_ids, metrics)
     # Note: xApp will unsubscribe all active subscriptions at exit.
@@ -0,0 +1,231 @@
+import collections
+import threading
+import numpy as np
+
+# (bucket length in seconds, number of buckets): 1 h of seconds, 1 day of minutes,
+# 30 days of hours and 1 year of days
+DEFAULT_TIERS = ((1, 3600), (60, 1440), (3600, 720), (86400, 366))
+
+
+class RollupTier:
+    """
+    Fixed-size ring of time buckets of one resolution, each holding the count, sum, min and
+    max of the power samples and the energy integrated within the bucket. A bucket is
+    addressed by floor(ts / resolution) and evicts the bucket `slots` positions older.
+    """
+
+    def __init__(self, resolution, slots):
+        self.resolution = resolution
+        self.slots = slots
+        self.bucket = np.full(slots, -1, dtype=np.int64)
+        self.count = np.zeros(slots, dtype=np.int64)
+        self.power_sum = np.zeros(slots)
+        self.power_min = np.full(slots, np.inf)
+        self.power_max = np.full(slots, -np.inf)
+        self.energy = np.zeros(slots)
+        self.newest = -1
+
+    def merge(self, bucket, count, power_sum, power_min, power_max, energy):
+        # Adds samples, or a closed bucket of a finer tier, to the bucket of this tier
+        i = bucket % self.slots
+        if self.bucket[i] != bucket:
+            self.bucket[i] = bucket
+            self.count[i] = 0
+            self.power_sum[i] = 0.0
+            self.power_min[i] = np.inf
+            self.power_max[i] = -np.inf
+            self.energy[i] = 0.0
+        self.count[i] += count
+        self.power_sum[i] += power_sum
+        self.power_min[i] = min(self.power_min[i], power_min)
+        self.power_max[i] = max(self.power_max[i], power_max)
+        self.energy[i] += energy
+        self.newest = max(self.newest, bucket)
+
+    def row(self, bucket):
+        i = bucket % self.slots
+        return (bucket, self.count[i], self.power_sum[i], self.power_min[i], self.power_max[i], self.energy[i])
+
+    def copy(self):
+        tier = RollupTier(self.resolution, self.slots)
+        for name in ("bucket", "count", "power_sum", "power_min", "power_max", "energy"):
+            setattr(tier, name, getattr(self, name).copy())
+        tier.newest = self.newest
+        return tier
+
+    def series(self, t_start=None, t_end=None):
+        # Buckets kept, oldest first, as a dict of arrays (start time, mean/min/max power, energy)
+        valid = self.bucket >= 0
+        if t_start is not None:
+            valid &= self.bucket >= int(np.floor(t_start / self.resolution))
+        if t_end is not None:
+            valid &= self.bucket <= int(np.floor(t_end / self.resolution))
+        order = np.argsort(self.bucket[valid])
+        count = self.count[valid][order]
+        return {
+            "start": (self.bucket[valid][order] * self.resolution).tolist(),
+            "samples": count.tolist(),
+            "power_mean_w": (self.power_sum[valid][order] / np.maximum(count, 1)).tolist(),
+            "power_min_w": self.power_min[valid][order].tolist(),
+            "power_max_w": self.power_max[valid][order].tolist(),
+            "energy_wh": self.energy[valid][order].tolist(),
+        }
+
+
+class PowerRollup:
+    """
+    Power predictions of one series (an E2 node, or a UE of a node) rolled up into tiers of
+    increasing resolution, with the energy integrated over the real time between samples.
+
+    Samples go to the finest tier only. When a sample falls into a new bucket of a tier, the
+    bucket it left is closed and merged into the next tier, so every tier is downsampled from
+    the one below and memory does not grow with uptime. The trapezoidal energy between two
+    samples is only counted when they are at most `max_gap` seconds apart, a longer gap
+    means the node stopped reporting and its power is unknown. A sample older than the
+    previous one is still counted in its buckets, only its energy is not integrated.
+    """
+
+    def __init__(self, tiers=DEFAULT_TIERS, max_gap=10.0):
+        self.tiers = [RollupTier(resolution, slots) for resolution, slots in tiers]
+        self.max_gap = max_gap
+        self.total_energy = 0.0
+        self.samples = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.last_power = None
+
+    def add(self, ts, power):
+        if self.last_ts is not None and ts < self.last_ts:
+            self._add_late(ts, power)
+            return
+
+        energy = 0.0
+        if self.last_ts is not None:
+            dt = ts - self.last_ts
+            if dt <= self.max_gap:
+                energy = (self.last_power + power) / 2 * dt / 3600
+        else:
+            self.first_ts = ts
+        self.total_energy += energy
+        self.samples += 1
+        self.last_ts = ts
+        self.last_power = power
+
+        bucket = int(ts // self.tiers[0].resolution)
+        self._close(0, bucket)
+        self.tiers[0].merge(bucket, 1, power, power, power, energy)
+
+    def _add_late(self, ts, power):
+        # A sample older than the previous one goes to the finest tier whose bucket for it is
+        # still open (the buckets of the finer tiers were already closed), with no energy, as
+        # the integration goes on from the newest sample
+        self.samples += 1
+        self.first_ts = min(self.first_ts, ts)
+        for level, tier in enumerate(self.tiers):
+            bucket = int(ts // tier.resolution)
+            if bucket >= tier.newest:
+                self._close(level, bucket)
+                tier.merge(bucket, 1, power, power, power, 0.0)
+                return
+
+    def _close(self, level, bucket):
+        # Merges the open bucket of `level` into the next tier when `bucket` starts a new one
+        tier = self.tiers[level]
+        if tier.newest < 0 or bucket <= tier.newest or level + 1 == len(self.tiers):
+            return
+        closed = tier.row(tier.newest)
+        upper = self.tiers[level + 1]
+        upper_bucket = int(closed[0] * tier.resolution // upper.resolution)
+        self._close(level + 1, upper_bucket)
+        upper.merge(upper_bucket, *closed[1:])
+
+    def tier(self, resolution):
+        # A copy of the tier with the buckets still open in the finer tiers merged in
+        levels = [t.resolution for t in self.tiers]
+        if resolution not in levels:
+            raise KeyError(resolution)
+        level = levels.index(resolution)
+        view = self.tiers[level].copy()
+        for lower in self.tiers[:level]:
+            if lower.newest >= 0:
+                row = lower.row(lower.newest)
+                view.merge(int(row[0] * lower.resolution // view.resolution), *row[1:])
+        return view
+
+    def summary(self):
+        # Totals and the current bucket of every tier, read from the tiers only
+        current = {}
+        for tier in self.tiers:
+            view = self.tier(tier.resolution)
+            if view.newest < 0:
+                continue
+            bucket, count, power_sum, power_min, power_max, energy = view.row(view.newest)
+            current[tier.resolution] = {
+                "start": int(bucket * tier.resolution),
+                "samples": int(count),
+                "power_mean_w": power_sum / max(count, 1),
+                "power_min_w": power_min,
+                "power_max_w": power_max,
+                "energy_wh": energy,
+            }
+        return {
+            "samples": self.samples,
+            "first_ts": self.first_ts,
+            "last_ts": self.last_ts,
+            "last_power_w": self.last_power,
+            "total_energy_wh": self.total_energy,
+            "current": current,
+        }
+
+
+class RollupStore:
+    """
+    PowerRollup of every node, and of every UE of a node, keyed by (node_id, ue_id) with
+    ue_id None for the node itself. Only the `max_ue_series` most recently updated UE series
+    are kept, so UEs coming and going do not grow memory either.
+    """
+
+    def __init__(self, tiers=DEFAULT_TIERS, max_gap=10.0, max_ue_series=64):
+        self.tier_spec = tiers
+        self.max_gap = max_gap
+        self.max_ue_series = max_ue_series
+        self._series = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, node_id, ue_id, ts, power):
+        key = (node_id, ue_id)
+        with self._lock:
+            rollup = self._series.get(key)
+            if rollup is None:
+                rollup = self._series[key] = PowerRollup(self.tier_spec, self.max_gap)
+                self._evict()
+            self._series.move_to_end(key)
+            rollup.add(ts, float(power))
+            return rollup.total_energy
+
+    def _evict(self):
+        ue_keys = [key for key in self._series if key[1] is not None]
+        for key in ue_keys[:max(0, len(ue_keys) - self.max_ue_series)]:
+            del self._series[key]
+
+    def keys(self):
+        with self._lock:
+            return list(self._series)
+
+    def summary(self, node_id=None, ue_id=None):
+        # UE ids are compared as strings, as they arrive in HTTP queries
+        with self._lock:
+            return {self._label(key): rollup.summary() for key, rollup in self._series.items()
+                    if (node_id is None or key[0] == node_id) and (ue_id is None or str(key[1]) == str(ue_id))}
+
+    def series(self, node_id, ue_id, resolution, t_start=None, t_end=None):
+        with self._lock:
+            for key, rollup in self._series.items():
+                if key[0] == node_id and (str(key[1]) == str(ue_id) if ue_id is not None else key[1] is None):
+                    return rollup.tier(resolution).series(t_start, t_end)
+        raise KeyError((node_id, ue_id))
+
+    @staticmethod
+    def _label(key):
+        node_id, ue_id = key
+        return node_id if ue_id is None else f"{node_id}/{ue_id}"
@@ -0,0 +1,72 @@
+import collections
+import threading
+import numpy as np
+
+
+class PredictionCache:
+    """
+    LRU memoization of model predictions, keyed on the model name and the feature row
+    quantized with one step per feature (airtime, snr, mcs_ul).
+
+    KPM values are integers, so windowed features keep coming back to the same few points
+    and most rows never reach the model. To make a prediction depend only on its key, the
+    model is evaluated on the quantized row (the feature values rounded to their step), so
+    a cached row gets exactly the value it would get on a miss.
+    """
+
+    def __init__(self, max_entries=4096, quantum=(0.01, 0.5, 0.25)):
+        self.max_entries = max_entries
+        self.quantum = np.asarray(quantum, dtype=np.float64)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def predict(self, model_name, predict, features):
+        # predict(rows) -> one value per row, called once with the distinct missing rows
+        steps = np.round(np.asarray(features, dtype=np.float64) / self.quantum).astype(np.int64)
+        keys = [(model_name,) + tuple(row) for row in steps.tolist()]
+        values = np.empty(len(keys))
+
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                value = self._entries.get(key)
+                if value is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._entries.move_to_end(key)
+                    values[i] = value
+            n_missing = sum(len(indices) for indices in missing.values())
+            self.hits += len(keys) - n_missing
+            self.misses += n_missing
+
+        if missing:
+            rows = np.array([key[1:] for key in missing], dtype=np.float64) * self.quantum
+            predicted = predict(rows)
+            with self._lock:
+                for (key, indices), value in zip(missing.items(), predicted):
+                    values[indices] = value
+                    self._entries[key] = float(value)
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return values
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
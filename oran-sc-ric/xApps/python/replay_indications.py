@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import time
+import numpy as np
+import oranor_xapp
+from indication_recorder import read_recording
+from offline_xapp import create_offline
+from xapp_logging import get_logger, setup_logging_from_args
+
+log = get_logger("replay")
+
+# Replays the indications recorded by `oranor_xapp.py --record <file>` into the xApp, with
+# no RMR nor RIC, and reports the throughput and latency of the subscription callback:
+#   python3 replay_indications.py --recording indications.kpm --speed 0 --model models/<model>.pkl
+
+
+class RecordedClock:
+    # Stands for time.time() in the xApp (MyXapp.clock): the recorded arrival time of the
+    # indication being replayed, so the feature windows fill the same at any speed
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def replay(indications, callback, speed=1.0, clock=None):
+    """
+    Calls `callback(e2_agent_id, subscription_id, indication_hdr, indication_msg)` for each
+    indication (any iterable of Indication, in arrival order), spaced as recorded divided by
+    `speed` (0 replays at maximum speed). A RecordedClock is set to the arrival time of each
+    indication before its callback.
+
+    Returns the throughput, the latency of the callback, the time spent in it (busy) and how
+    late the indications were delivered compared to the recorded spacing (lag), in seconds.
+    """
+
+    latencies = []
+    lag = 0.0
+    errors = 0
+    first = None
+    start = time.perf_counter()
+    for i, indication in enumerate(indications):
+        if first is None:
+            first = indication.time
+        if speed > 0:
+            due = start + (indication.time - first) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lag = max(lag, -delay)
+        if clock is not None:
+            clock.now = indication.time
+        begin = time.perf_counter()
+        try:
+            callback(indication.e2_agent_id, indication.subscription_id, indication.indication_hdr, indication.indication_msg)
+        except Exception as e:
+            errors += 1
+            log.error(f"Indication {i} failed: {e}")
+        latencies.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies)
+    report = {"indications": len(latencies), "errors": errors, "speed": speed, "elapsed": elapsed,
+              "throughput": len(latencies) / elapsed if elapsed > 0 else None, "busy": float(latencies.sum()), "max_lag": lag}
+    if len(latencies):
+        report["callback"] = {"mean": float(latencies.mean()), "p50": float(np.percentile(latencies, 50)),
+                              "p99": float(np.percentile(latencies, 99)), "max": float(latencies.max())}
+    return report
+
+
+def format_report(report):
+    lines = [f"{report['indications']} indications in {report['elapsed']:.3f} s "
+             f"({report['throughput'] or 0:.1f}/s, speed {report['speed'] or 'max'}), {report['errors']} errors, max lag {report['max_lag'] * 1000:.1f} ms"]
+    if report["elapsed"] > 0:
+        lines.append(f"Time spent in the callback: {report['busy']:.3f} s ({100 * report['busy'] / report['elapsed']:.1f}% of the replay)")
+    if "drain" in report:
+        lines.append(f"Pending predictions and rows drained in {report['drain'] * 1000:.1f} ms")
+    if "callback" in report:
+        c = report["callback"]
+        lines.append(f"Callback latency: mean {c['mean'] * 1000:.3f} ms, p50 {c['p50'] * 1000:.3f} ms, p99 {c['p99'] * 1000:.3f} ms, max {c['max'] * 1000:.3f} ms")
+    if report.get("stages"):
+        lines.append(f"  {'stage':<20} {'count':>8} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10}")
+        for stage, s in sorted(report["stages"].items(), key=lambda item: str(item[0])):
+            lines.append(f"  {stage:<20} {s['count']:>8} {s['mean'] * 1000:>10.3f} {s['p50'] * 1000:>10.3f} {s['p99'] * 1000:>10.3f}")
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay recorded RIC indications into the xApp')
+    parser.add_argument("--recording", type=str, required=True, help="File written by oranor_xapp.py --record")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed: 1 as recorded, N times faster, 0 as fast as possible")
+    parser.add_argument("--report", type=str, default='', help="Also write the report to this JSON file")
+    oranor_xapp.add_arguments(parser)
+    parser.set_defaults(http_server_port=0, log_level='WARNING')
+
+    args = parser.parse_args()
+    oranor_xapp.check_arguments(parser, args)
+    setup_logging_from_args(args)
+    metadata, indications = read_recording(args.recording)
+    kpm_report_style = metadata.get("kpm_report_style", args.kpm_report_style)
+    ue_ids = metadata.get("ue_ids", [0])
+    e2_node_ids = metadata.get("e2_node_ids") or sorted({indication.e2_agent_id for indication in indications})
+    print(f"Loaded {len(indications)} indications of report style {kpm_report_style} from {len(e2_node_ids)} E2 nodes")
+
+    xapp = create_offline(oranor_xapp.MyXapp, *oranor_xapp.xapp_arguments(args))
+    xapp.e2sm_kpm.set_ran_func_id(args.ran_func_id)
+    xapp.batcher.n_nodes = len(e2_node_ids)
+    xapp.clock = clock = RecordedClock()
+    # Same binding as MyXapp.subscribe, the UE ID is not in the indications of style 2
+    ue_id = ue_ids[0] if kpm_report_style == 2 else None
+    callback = lambda agent, sub, hdr, msg: xapp.my_subscription_callback(agent, sub, hdr, msg, kpm_report_style, ue_id)
+
+    report = replay(indications, callback, args.speed, clock)
+    start = time.perf_counter()
+    xapp.close()
+    report["drain"] = time.perf_counter() - start
+    report["stages"] = xapp.stage_latency.summary()
+
+    print(format_report(report))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,126 @@
+import collections
+import os
+import signal
+import sys
+import threading
+import time
+from http_endpoints import add_endpoint, json_body
+from xapp_logging import get_logger
+
+log = get_logger("sampling_profiler")
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a running process: a background thread reads the stack of every
+    other thread each `interval` seconds and counts identical stacks.
+
+    The result is written in the collapsed-stack format ("thread;outer;...;inner count" per
+    line) read by flamegraph.pl, speedscope or inferno. Nothing runs while the profiler is
+    off, and while it is on the profiled threads are never instrumented, only sampled.
+    """
+
+    def __init__(self, output_dir="./Profiles", interval=0.005):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.last_output = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration=30.0):
+        # Returns False when a profile is already being recorded
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(duration,), name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        # Ends the current profile early, it is still written
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        return self.last_output
+
+    def _run(self, duration):
+        stacks = collections.Counter()
+        own = threading.get_ident()
+        names = {}
+        samples = 0
+        start = time.perf_counter()
+        end = start + duration
+        while not self._stop.is_set() and time.perf_counter() < end:
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    stacks[self._collapse(names.get(ident, str(ident)), frame)] += 1
+            samples += 1
+            self._stop.wait(self.interval)
+        self.last_output = self._write(stacks, samples, time.perf_counter() - start)
+
+    @staticmethod
+    def _collapse(thread_name, frame):
+        functions = []
+        while frame is not None:
+            code = frame.f_code
+            functions.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        functions.append(thread_name)
+        return ";".join(reversed(functions))
+
+    def _write(self, stacks, samples, elapsed):
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        path = os.path.join(self.output_dir, f"profile-{time.strftime('%d%m%Y-%H%M%S')}.folded")
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        log.info(f"Profile of {samples} samples over {elapsed:.1f} s written to {path}")
+        return path
+
+
+def enable_profiling(xapp, signum=signal.SIGUSR1, duration=30.0, output_dir="./Profiles", interval=0.005):
+    """
+    Makes the profiler of an xAppBase xApp available at runtime:
+
+    - `kill -USR1 <pid>` records a profile of `duration` seconds, or ends the current one;
+    - POST /ric/v1/profiler with {"duration": <s>} records one, {"action": "stop"} ends it,
+      GET /ric/v1/profiler tells whether it runs and where the last profile was written.
+
+    Must be called from the main thread, which is the one that receives signals.
+    """
+
+    profiler = SamplingProfiler(output_dir, interval)
+
+    def on_signal(sig, frame):
+        if profiler.running:
+            threading.Thread(target=profiler.stop, daemon=True).start()
+        elif profiler.start(duration):
+            log.info(f"Sampling profiler started for {duration} s")
+
+    def status(path, data):
+        return 200, {"running": profiler.running, "last_output": profiler.last_output}
+
+    def control(path, data):
+        body = json_body(data)
+        if body.get("action") == "stop":
+            return 200, {"running": False, "output": profiler.stop()}
+        seconds = float(body.get("duration", duration))
+        if not profiler.start(seconds):
+            return 409, {"error": "The profiler is already running"}
+        return 200, {"running": True, "duration": seconds}
+
+    signal.signal(signum, on_signal)
+    add_endpoint(xapp, "GET", "profilerStatus", "/ric/v1/profiler", status)
+    add_endpoint(xapp, "POST", "profiler", "/ric/v1/profiler", control)
+    xapp.profiler = profiler
+    return profiler
@@ -0,0 +1,147 @@
+import collections
+import threading
+import numpy as np
+from model_loader import predict_rows
+from xapp_logging import get_logger
+
+log = get_logger("shadow_scoring")
+
+
+class ShadowScorer:
+    """
+    Scores the same feature rows with every model of a registry except the primary one.
+
+    submit() returns at once, so the primary prediction and its rows never wait for the
+    shadow ones. Batches wait in a queue of at most `max_pending` batches not started yet,
+    and `workers` threads score them, one model at a time, oldest batch first. When the
+    shadow models fall behind, the oldest waiting batch is dropped: the models not started
+    on it yield NaN, and its rows are counted in `dropped`. A shadow model that fails yields
+    NaN for the batch instead of failing it.
+    """
+
+    def __init__(self, registry, workers=None, max_pending=4):
+        self.registry = registry
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._run, name=f"shadow-{i}", daemon=True)
+                         for i in range(workers or len(registry.models))]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, features, primary):
+        batch = ShadowBatch([name for name in self.registry.models if name != primary], features)
+        dropped = []
+        with self._cond:
+            while len(self._queue) >= self.max_pending:
+                dropped.append(self._queue.popleft())
+            self.dropped += sum(old.n_rows for old in dropped)
+            self._queue.append(batch)
+            self._cond.notify()
+        for old in dropped:
+            old.drop()
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                batch = self._queue[0]
+                name = batch.start()
+                # A batch leaves the queue once every model has started on it
+                if not batch.waiting:
+                    self._queue.popleft()
+
+            try:
+                values = predict_rows(self.registry.models[name], batch.features)
+            except Exception as e:
+                log.error(f"Error in shadow model {name}: {e}")
+                values = np.full(batch.n_rows, np.nan)
+            batch.set(name, values)
+
+    def close(self, timeout=10.0):
+        # Batches already queued are scored, at most max_pending, so their callbacks still run
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        if self.dropped:
+            log.warning(f"Shadow scoring dropped {self.dropped} rows (shadow models behind)")
+
+
+class ShadowBatch:
+    """
+    Pending predictions of the shadow models for one batch of rows.
+
+    Callbacks added with when_done() get the predictions by model name once every shadow
+    model has scored the batch (or the batch was dropped), on the thread of the last one to
+    finish, or right away when they are already there.
+    """
+
+    def __init__(self, names, features):
+        self.features = features
+        self.n_rows = len(features)
+        self.waiting = list(names)
+        self._values = {}
+        self._remaining = len(names)
+        self._done = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+        if not names:
+            self._done = {}
+
+    def start(self):
+        # Under the scorer lock: the next model to score this batch with
+        return self.waiting.pop(0)
+
+    def drop(self):
+        # Models not started on the batch yield NaN
+        with self._lock:
+            names, self.waiting = self.waiting, []
+        for name in names:
+            self.set(name, np.full(self.n_rows, np.nan))
+
+    def set(self, name, values):
+        with self._lock:
+            self._values[name] = values
+            self._remaining -= 1
+            if self._remaining:
+                return
+            self._done = self._values
+            # The features are not needed any more
+            self.features = None
+            callbacks, self._callbacks = self._callbacks, []
+        for callback, start, stop in callbacks:
+            self._run(callback, start, stop)
+
+    def rows(self, start, stop):
+        return ShadowRows(self, start, stop)
+
+    def when_done(self, callback, start=0, stop=None):
+        with self._lock:
+            if self._done is None:
+                self._callbacks.append((callback, start, stop))
+                return
+        self._run(callback, start, stop)
+
+    def _run(self, callback, start, stop):
+        try:
+            callback({name: values[start:stop] for name, values in self._done.items()})
+        except Exception as e:
+            log.error(f"Error writing shadow predictions: {e}")
+
+
+class ShadowRows(collections.namedtuple("ShadowRows", "batch start stop")):
+    # The rows of one node in a ShadowBatch
+
+    def rows(self, start, stop):
+        return ShadowRows(self.batch, self.start + start, self.start + stop)
+
+    def when_done(self, callback):
+        self.batch.when_done(callback, self.start, self.stop)
@@ -3,6 +3,10 @@
 import argparse
 import signal
 from lib.xAppBase import xAppBase
+from sampling_profiler import enable_profiling
+from xapp_logging import add_logging_args, get_logger, setup_logging_from_args
+
+log = get_logger("simple_mon")
 
 
 class MyXapp(xAppBase):
@@ -10,26 +14,27 @@ class MyXapp(xAppBase):
         super(MyXapp, self).__init__(config, http_server_port, rmr_port)
 
     def my_subscription_callback(self, e2_agent_id, subscription_id, indication_hdr, indication_msg):
-        print("\nRIC Indication Received from {} for Subscription ID: {}".format(e2_agent_id, subscription_id))
         indication_hdr = self.e2sm_kpm.extract_hdr_info(indication_hdr)
         meas_data = self.e2sm_kpm.extract_meas_data(indication_msg)
 
-        print("E2SM_KPM RIC Indication Content:")
-        print("-ColletStartTime: ", indication_hdr['colletStartTime'])
-        print("-Measurements Data:")
+        lines = ["\nRIC Indication Received from {} for Subscription ID: {}".format(e2_agent_id, subscription_id)]
+        lines.append("E2SM_KPM RIC Indication Content:")
+        lines.append("-ColletStartTime: {}".format(indication_hdr['colletStartTime']))
+        lines.append("-Measurements Data:")
 
         granulPeriod = meas_data.get("granulPeriod", None)
         if granulPeriod is not None:
-            print("-granulPeriod: {}".format(granulPeriod))
+            lines.append("-granulPeriod: {}".format(granulPeriod))
 
         for metric_name, value in meas_data["measData"].items():
-                print("--Metric: {}, Value: {}".format(metric_name, value))
+                lines.append("--Metric: {}, Value: {}".format(metric_name, value))
+        log.info("\n".join(lines))
 
     # Mark the function as xApp start function using xAppBase.start_function decorator.
     # It is required to start the internal msg receive loop.
     @xAppBase.start_function
     def start(self, e2_node_id, metric_names):
-        print("Subscribe to E2 node ID: {}, RAN func: e2sm_kpm for metrics {}".format(e2_node_id, metrics))
+        log.info("Subscribe to E2 node ID: {}, RAN func: e2sm_kpm for metrics {}".format(e2_node_id, metrics))
         report_period = 1000
         granul_period = 100
         self.e2sm_kpm.subscribe_report_service_style_1(e2_node_id, report_period, metric_names, granul_period, self.my_subscription_callback)
@@ -43,8 +48,10 @@ if __name__ == '__main__':
     parser.add_argument("--e2_node_id", type=str, default='gnbd_001_001_00019b_0', help="E2 Node ID")
     parser.add_argument("--ran_func_id", type=int, default=2, help="RAN function ID")
     parser.add_argument("--metrics", type=str, default='DRB.UEThpDl', help="Metrics name as comma-separated string")
+    add_logging_args(parser)
 
     args = parser.parse_args()
+    setup_logging_from_args(args)
     config = args.config
     e2_node_id = args.e2_node_id # TODO: get available E2 nodes from SubMgr, now the id has to be given.
     ran_func_id = args.ran_func_id # TODO: get available E2 nodes from SubMgr, now the id has to be given.
@@ -59,6 +66,9 @@ if __name__ == '__main__':
     signal.signal(signal.SIGTERM, myXapp.signal_handler)
     signal.signal(signal.SIGINT, myXapp.signal_handler)
 
+    # Sampling profiler on demand: kill -USR1 <pid> or POST /ric/v1/profiler
+    enable_profiling(myXapp)
+
     # Start xApp.
     myXapp.start(e2_node_id, metrics)
     # Note: xApp will unsubscribe all active subscriptions at exit.
@@ -5,6 +5,10 @@ import datetime
 import argparse
 import signal
 from lib.xAppBase import xAppBase
+from sampling_profiler import enable_profiling
+from xapp_logging import add_logging_args, get_logger, setup_logging_from_args
+
+log = get_logger("simple_rc")
 
 class MyXapp(xAppBase):
     def __init__(self, config, http_server_port, rmr_port):
@@ -19,21 +23,21 @@ class MyXapp(xAppBase):
             min_prb_ratio = 1
             max_prb_ratio = 5
             current_time = datetime.datetime.now()
-            print("{} Send RIC Control Request to E2 node ID: {} for UE ID: {}, PRB_min_ratio: {}, PRB_max_ratio: {}".format(current_time.strftime("%H:%M:%S"), e2_node_id, ue_id, min_prb_ratio, max_prb_ratio))
+            log.info("{} Send RIC Control Request to E2 node ID: {} for UE ID: {}, PRB_min_ratio: {}, PRB_max_ratio: {}".format(current_time.strftime("%H:%M:%S"), e2_node_id, ue_id, min_prb_ratio, max_prb_ratio))
             self.e2sm_rc.control_slice_level_prb_quota(e2_node_id, ue_id, min_prb_ratio, max_prb_ratio, dedicated_prb_ratio=100, ack_request=1)
             time.sleep(5)
 
             min_prb_ratio = 1
             max_prb_ratio = 40
             current_time = datetime.datetime.now()
-            print("{} Send RIC Control Request to E2 node ID: {} for UE ID: {}, PRB_min_ratio: {}, PRB_max_ratio: {}".format(current_time.strftime("%H:%M:%S"), e2_node_id, ue_id, min_prb_ratio, max_prb_ratio))
+            log.info("{} Send RIC Control Request to E2 node ID: {} for UE ID: {}, PRB_min_ratio: {}, PRB_max_ratio: {}".format(current_time.strftime("%H:%M:%S"), e2_node_id, ue_id, min_prb_ratio, max_prb_ratio))
             self.e2sm_rc.control_slice_level_prb_quota(e2_node_id, ue_id, min_prb_ratio, max_prb_ratio, dedicated_prb_ratio=100, ack_request=1)
             time.sleep(5)
 
             min_prb_ratio = 1
             max_prb_ratio = 100
             current_time = datetime.datetime.now()
-            print("{} Send RIC Control Request to E2 node ID: {} for UE ID: {}, PRB_min_ratio: {}, PRB_max_ratio: {}".format(current_time.strftime("%H:%M:%S"), e2_node_id, ue_id, min_prb_ratio, max_prb_ratio))
+            log.info("{} Send RIC Control Request to E2 node ID: {} for UE ID: {}, PRB_min_ratio: {}, PRB_max_ratio: {}".format(current_time.strftime("%H:%M:%S"), e2_node_id, ue_id, min_prb_ratio, max_prb_ratio))
             self.e2sm_rc.control_slice_level_prb_quota(e2_node_id, ue_id, min_prb_ratio, max_prb_ratio, dedicated_prb_ratio=100, ack_request=1)
             time.sleep(5)
 
@@ -46,9 +50,11 @@ if __name__ == '__main__':
     parser.add_argument("--e2_node_id", type=str, default='gnbd_001_001_00019b_0', help="E2 Node ID")
     parser.add_argument("--ran_func_id", type=int, default=3, help="E2SM RC RAN function ID")
     parser.add_argument("--ue_id", type=int, default=0, help="UE ID")
+    add_logging_args(parser)
 
 
     args = parser.parse_args()
+    setup_logging_from_args(args)
     config = args.config
     e2_node_id = args.e2_node_id # TODO: get available E2 nodes from SubMgr, now the id has to be given.
     ran_func_id = args.ran_func_id # TODO: get available E2 nodes from SubMgr, now the id has to be given.
@@ -63,5 +69,8 @@ if __name__ == '__main__':
     signal.signal(signal.SIGTERM, myXapp.signal_handler)
     signal.signal(signal.SIGINT, myXapp.signal_handler)
 
+    # Sampling profiler on demand: kill -USR1 <pid> or POST /ric/v1/profiler
+    enable_profiling(myXapp)
+
     # Start xApp.
     myXapp.start(e2_node_id, ue_id)
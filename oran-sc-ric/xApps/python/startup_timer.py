@@ -0,0 +1,27 @@
+import time
+
+
+class StartupTimer:
+    """
+    Wall-clock time of the startup stages of an xApp (imports, model load, subscription...),
+    each measured from the end of the previous one.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = []
+        self._last = self.start
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    def total(self):
+        return self._last - self.start
+
+    def report(self):
+        lines = ["Startup timing:"]
+        lines += [f"  {stage:<20} {seconds * 1000:10.1f} ms" for stage, seconds in self.stages]
+        lines.append(f"  {'total':<20} {self.total() * 1000:10.1f} ms")
+        return "\n".join(lines)
@@ -0,0 +1,207 @@
+import json
+import numpy as np
+
+
+class CompiledTreeEnsemble:
+    """
+    Array-backed form of a fitted tree model (single tree, random forest, gradient boosting
+    or XGBoost gbtree), evaluated by walking all trees for all rows at once.
+
+    All trees share flat node arrays; a leaf has feature -1 and its output in `value`. The
+    prediction is `base + scale * sum(leaf values)`. sklearn sends a row left when
+    x <= threshold on float32 inputs, XGBoost when x < threshold; `strict` selects the
+    latter. Rows with NaN follow `default_left`. XGBoost adds the leaves one tree after the
+    other in float32, starting from the base score; `float32_sum` does the same, so the
+    compiled model returns the very same values.
+    """
+
+    def __init__(self, roots, feature, threshold, left, right, value, default_left, max_depth,
+                 base=0.0, scale=1.0, strict=False, float32_sum=False, n_features=None):
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.max_depth = int(max_depth)
+        self.base = float(base)
+        self.scale = float(scale)
+        self.strict = bool(strict)
+        self.float32_sum = bool(float32_sum)
+        self.n_features = n_features
+        # Feature index usable for gathering, leaves read column 0 and ignore it
+        self._gather_feature = np.maximum(self.feature, 0)
+        self._is_leaf = self.feature < 0
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.roots, self.feature, self.threshold, self.left, self.right, self.value, self.default_left))
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        rows = np.arange(len(X))[:, None]
+        node = np.repeat(self.roots[None, :], len(X), axis=0)
+
+        for _ in range(self.max_depth):
+            leaf = self._is_leaf[node]
+            if leaf.all():
+                break
+            x = X[rows, self._gather_feature[node]]
+            threshold = self.threshold[node]
+            go_left = x < threshold if self.strict else x <= threshold
+            go_left = np.where(np.isnan(x), self.default_left[node], go_left)
+            node = np.where(leaf, node, np.where(go_left, self.left[node], self.right[node]))
+
+        if self.float32_sum:
+            # cumsum adds in order, unlike sum, which uses pairwise summation
+            leaves = np.column_stack([np.full(len(X), self.base), self.value[node]]).astype(np.float32)
+            return np.cumsum(leaves, axis=1, dtype=np.float32)[:, -1]
+        return self.base + self.scale * self.value[node].sum(axis=1)
+
+    _ARRAYS = ("roots", "feature", "threshold", "left", "right", "value", "default_left")
+
+    def arrays(self):
+        # Everything needed to rebuild the model, as plain arrays for np.savez
+        arrays = {name: getattr(self, name) for name in self._ARRAYS}
+        arrays.update(format="trees", max_depth=self.max_depth, base=self.base, scale=self.scale,
+                      strict=self.strict, float32_sum=self.float32_sum, n_features=-1 if self.n_features is None else self.n_features)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        n_features = int(arrays["n_features"])
+        return cls(*(arrays[name] for name in cls._ARRAYS), int(arrays["max_depth"]), float(arrays["base"]), float(arrays["scale"]),
+                   bool(arrays["strict"]), bool(arrays["float32_sum"]), None if n_features < 0 else n_features)
+
+
+class _TreeCollector:
+    # Accumulates trees into the flat arrays of a CompiledTreeEnsemble
+
+    def __init__(self, threshold_dtype):
+        self.threshold_dtype = threshold_dtype
+        self.roots, self.feature, self.threshold = [], [], []
+        self.left, self.right, self.value, self.default_left = [], [], [], []
+        self.max_depth = 0
+        self._n_nodes = 0
+
+    def add(self, feature, threshold, left, right, value, default_left, depth):
+        offset = self._n_nodes
+        feature = np.asarray(feature)
+        leaf = (np.asarray(left) < 0)
+        self.roots.append(offset)
+        self.feature.append(np.where(leaf, -1, feature))
+        self.threshold.append(np.asarray(threshold, dtype=self.threshold_dtype))
+        # Leaves point to themselves, so a finished row stays in place
+        own = np.arange(len(feature)) + offset
+        self.left.append(np.where(leaf, own, np.asarray(left) + offset))
+        self.right.append(np.where(leaf, own, np.asarray(right) + offset))
+        self.value.append(np.where(leaf, np.asarray(value, dtype=np.float64), 0.0))
+        self.default_left.append(np.asarray(default_left, dtype=bool))
+        self.max_depth = max(self.max_depth, depth)
+        self._n_nodes += len(feature)
+
+    def build(self, **kwargs):
+        return CompiledTreeEnsemble(
+            self.roots, np.concatenate(self.feature), np.concatenate(self.threshold),
+            np.concatenate(self.left), np.concatenate(self.right), np.concatenate(self.value),
+            np.concatenate(self.default_left), self.max_depth, **kwargs)
+
+
+def _add_sklearn_tree(collector, estimator):
+    tree = estimator.tree_
+    missing_left = getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=bool))
+    collector.add(tree.feature, tree.threshold, tree.children_left, tree.children_right,
+                  tree.value[:, 0, 0], missing_left, tree.max_depth)
+
+
+def _compile_sklearn(model):
+    from sklearn.tree import DecisionTreeRegressor
+    from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor, GradientBoostingRegressor
+
+    # sklearn thresholds are float64 midpoints between float32 values, keep them exact
+    collector = _TreeCollector(np.float64)
+    if isinstance(model, DecisionTreeRegressor):
+        if model.n_outputs_ != 1:
+            return None
+        _add_sklearn_tree(collector, model)
+        return collector.build(n_features=model.n_features_in_)
+
+    if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+        if model.n_outputs_ != 1:
+            return None
+        for estimator in model.estimators_:
+            _add_sklearn_tree(collector, estimator)
+        return collector.build(scale=1.0 / len(model.estimators_), n_features=model.n_features_in_)
+
+    if isinstance(model, GradientBoostingRegressor):
+        if model.init_ == "zero":
+            base = 0.0
+        else:
+            # The initial estimator ignores the features (mean, quantile...), evaluate it once
+            base = float(np.ravel(model.init_.predict(np.zeros((1, model.n_features_in_))))[0])
+        for estimator in model.estimators_[:, 0]:
+            _add_sklearn_tree(collector, estimator)
+        return collector.build(base=base, scale=model.learning_rate, n_features=model.n_features_in_)
+
+    return None
+
+
+def _compile_xgboost(booster, iteration_end=None):
+    config = json.loads(booster.save_raw("json"))
+    learner = config["learner"]
+    if learner["objective"]["name"] != "reg:squarederror" or learner["gradient_booster"]["name"] != "gbtree":
+        return None
+    if int(learner["learner_model_param"].get("num_target", "1")) != 1:
+        return None
+    # Stored as "2.2E1" or, in recent versions, "[2.2E1]"
+    base = float(learner["learner_model_param"]["base_score"].strip("[]"))
+
+    trees = learner["gradient_booster"]["model"]["trees"]
+    if iteration_end is not None:
+        # One tree per boosting round for single-target gbtree
+        trees = trees[:iteration_end]
+
+    collector = _TreeCollector(np.float32)
+    for tree in trees:
+        left = np.asarray(tree["left_children"])
+        # Leaves keep their output in split_conditions
+        collector.add(tree["split_indices"], tree["split_conditions"], left, tree["right_children"],
+                      tree["split_conditions"], tree["default_left"], _depth(left, tree["right_children"]))
+    return collector.build(base=base, strict=True, float32_sum=True, n_features=int(learner["learner_model_param"]["num_feature"]))
+
+
+def _depth(left, right):
+    # Depth of a tree given by child arrays (root is node 0)
+    depth, level = 0, [0]
+    while True:
+        level = [child for node in level for child in (left[node], right[node]) if child >= 0]
+        if not level:
+            return depth
+        depth += 1
+
+
+def compile_model(model):
+    """
+    Returns a CompiledTreeEnsemble equivalent to `model`, or None when the model is not a
+    supported tree model (or uses options the compiled form does not reproduce).
+    """
+
+    module = type(model).__module__
+    if module.startswith("sklearn."):
+        return _compile_sklearn(model)
+    if module.startswith("xgboost."):
+        import xgboost as xgb
+        if isinstance(model, xgb.Booster):
+            return _compile_xgboost(model)
+        if isinstance(model, xgb.XGBRegressor):
+            # predict() stops at the best iteration when the model was trained with early stopping
+            best_iteration = getattr(model, "best_iteration", None)
+            return _compile_xgboost(model.get_booster(), None if best_iteration is None else best_iteration + 1)
+    return None
@@ -0,0 +1,143 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+
+LOGGER_NAME = "xapp"
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+_listener = None
+
+
+def get_logger(name=None):
+    # Loggers of the xApps and their modules, all below the "xapp" logger set up by setup_logging
+    return logging.getLogger(LOGGER_NAME if name is None else f"{LOGGER_NAME}.{name}")
+
+
+class ThrottleFilter(logging.Filter):
+    """
+    Thins out repetitive records, per call site (file and line), below WARNING.
+
+    With `every` = N only one record in N of a call site is kept (summary every N), and with
+    `interval` = s at most one per s seconds (rate limit). A kept record tells how many of
+    its call site were suppressed since the previous one. Warnings and errors always pass.
+    """
+
+    def __init__(self, every=1, interval=0.0):
+        super().__init__()
+        self.every = max(1, every)
+        self.interval = interval
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or (self.every == 1 and self.interval <= 0):
+            return True
+        site = (record.pathname, record.lineno)
+        with self._lock:
+            seen, suppressed, last = self._sites.get(site, (0, 0, 0.0))
+            keep = seen % self.every == 0 and record.created - last >= self.interval
+            if keep:
+                self._sites[site] = (seen + 1, 0, record.created)
+            else:
+                self._sites[site] = (seen + 1, suppressed + 1, last)
+        if keep and suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar suppressed]"
+        return keep
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    # QueueHandler that drops records when the queue is full instead of blocking the caller
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(level="INFO", every=1, interval=0.0, max_queue=10000, stream=sys.stdout):
+    """
+    Sends the "xapp" loggers to `stream` through a bounded queue drained by a background
+    thread, so a callback only formats and enqueues its records and never waits on stdout.
+    Records are throttled as described in ThrottleFilter. Calling it again replaces the
+    previous setup.
+    """
+
+    global _listener
+    logger = get_logger()
+    if _listener is not None:
+        _listener.stop()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    log_queue = queue.Queue(max_queue)
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(ThrottleFilter(every, interval))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+    output = logging.StreamHandler(stream)
+    output.setFormatter(logging.Formatter("%(message)s"))
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+    return handler
+
+
+def stop_logging():
+    # Writes out the queued records, runs at exit
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def add_logging_args(parser):
+    parser.add_argument("--log_level", type=str, default='INFO', choices=LEVELS, help="Lowest level of the messages that are logged")
+    parser.add_argument("--log_every", type=int, default=1, help="Log only one in N of the repetitive messages of a kind (per indication, per prediction)")
+    parser.add_argument("--log_interval", type=float, default=0.0, help="Log repetitive messages of a kind at most once every given seconds")
+
+
+def setup_logging_from_args(args):
+    return setup_logging(args.log_level, args.log_every, args.log_interval)
+
+
+def format_kpm_indication(e2_agent_id, subscription_id, kpm_report_style, ue_id, indication_hdr, meas_data):
+    # The content of a decoded E2SM-KPM indication as a single multi-line message
+    if kpm_report_style == 2:
+        lines = ["\nRIC Indication Received from {} for Subscription ID: {}, KPM Report Style: {}, UE ID: {}".format(e2_agent_id, subscription_id, kpm_report_style, ue_id)]
+    else:
+        lines = ["\nRIC Indication Received from {} for Subscription ID: {}, KPM Report Style: {}".format(e2_agent_id, subscription_id, kpm_report_style)]
+
+    lines.append("E2SM_KPM RIC Indication Content:")
+    lines.append("-ColletStartTime: {}".format(indication_hdr['colletStartTime']))
+    lines.append("-Measurements Data:")
+
+    granulPeriod = meas_data.get("granulPeriod", None)
+    if granulPeriod is not None:
+        lines.append("-granulPeriod: {}".format(granulPeriod))
+
+    if kpm_report_style in [1,2]:
+        for metric_name, value in meas_data["measData"].items():
+            lines.append("--Metric: {}, Value: {}".format(metric_name, value))
+
+    else:
+        for ue_id, ue_meas_data in meas_data["ueMeasData"].items():
+            lines.append("--UE_id: {}".format(ue_id))
+            granulPeriod = ue_meas_data.get("granulPeriod", None)
+            if granulPeriod is not None:
+                lines.append("---granulPeriod: {}".format(granulPeriod))
+
+            for metric_name, value in ue_meas_data["measData"].items():
+                lines.append("---Metric: {}, Value: {}".format(metric_name, value))
+    return "\n".join(lines)
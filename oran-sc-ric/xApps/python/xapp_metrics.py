@@ -0,0 +1,194 @@
+import bisect
+import os
+import resource
+import threading
+import time
+
+# Latency buckets in seconds, from 50 us to 5 s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def rss_mb():
+    # Resident memory of this process, from /proc on Linux, else the peak
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _labels(label, value):
+    return f'{{{label}="{value}"}}' if label is not None else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Prometheus histogram with an optional single label, e.g. the stage of a callback.
+
+    observe() is a bisect and a few additions under a lock, cheap enough for every
+    indication; cumulative bucket counts are only computed when scraped.
+    """
+
+    def __init__(self, name, help, label=None, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, label_value=None):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def timer(self):
+        return StageTimer(self)
+
+    def summary(self, quantiles=(0.5, 0.99)):
+        # Count, mean and quantiles per label value. Quantiles are interpolated within their
+        # bucket, as histogram_quantile() does, and capped at the last finite bound
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        result = {}
+        for label_value, (counts, total, count) in series.items():
+            stats = {"count": count, "mean": total / count if count else None}
+            for q in quantiles:
+                stats[f"p{q * 100:g}"] = self._quantile(q, counts, count)
+            result[label_value] = stats
+        return result
+
+    def _quantile(self, q, counts, count):
+        if not count:
+            return None
+        rank = q * count
+        cumulative = 0
+        for i, n in enumerate(counts):
+            if cumulative + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / n
+            cumulative += n
+        return self.buckets[-1]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for label_value, (counts, total, count) in sorted(series.items(), key=lambda item: str(item[0])):
+            prefix = f'{self.label}="{label_value}",' if self.label is not None else ""
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{prefix}le="{_number(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{_labels(self.label, label_value)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label, label_value)} {count}")
+        return lines
+
+
+class StageTimer:
+    """
+    Times consecutive stages with the monotonic clock: each lap(stage) records the time
+    since the previous lap (or the creation of the timer) under that stage.
+    """
+
+    __slots__ = ("histogram", "start", "last")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.histogram.observe(now - self.last, stage)
+        self.last = now
+        return now
+
+    def total(self, stage):
+        # Time since the creation of the timer, recorded under `stage`
+        now = time.perf_counter()
+        self.histogram.observe(now - self.start, stage)
+        return now
+
+
+class Counter:
+    # Prometheus counter with an optional single label
+
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        # An unlabelled counter is exported as 0 before its first increment
+        self._values = {} if label is not None else {None: 0}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, label_value=None):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for label_value, value in sorted(values.items(), key=lambda item: str(item[0])):
+            lines.append(f"{self.name}{_labels(self.label, label_value)} {_number(value)}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Counter or gauge whose value is read when scraped, from `read()` returning a number, or
+    a dict of numbers by label value. Used for state kept elsewhere (queue depths, the
+    counters of the inference pool or the prediction cache), which costs nothing until read.
+    """
+
+    def __init__(self, name, help, kind, read, label=None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.read = read
+        self.label = label
+
+    def render(self):
+        value = self.read()
+        if value is None:
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        values = value if isinstance(value, dict) else {None: value}
+        for label_value, v in sorted(values.items(), key=lambda item: str(item[0])):
+            lines.append(f"{self.name}{_labels(self.label, label_value)} {_number(v)}")
+        return lines
+
+
+class MetricsRegistry:
+    # The metrics of an xApp, rendered in the Prometheus text exposition format
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            try:
+                lines += metric.render()
+            except Exception as e:
+                lines.append(f"# {metric.name} unavailable: {e}")
+        return "\n".join(lines) + "\n"